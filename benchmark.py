@@ -0,0 +1,187 @@
+import argparse
+import json
+import math
+import platform
+from sys import exit, stderr
+import numpy
+from headless import create_context, release_context, OffscreenTarget, run_scene, frame_time_summary, configure_video_driver, configure_mesa_override
+from graphics.startup import configure_opengl
+from graphics.formats import OUTPUT_FORMATS
+from scene.sky_model import SIZE_HORIZON
+
+
+def path_static(frame_count, rng):
+    return numpy.zeros(frame_count), numpy.zeros(frame_count)
+
+
+def path_sweep(frame_count, rng):
+    # A full turn around the horizon.
+    return numpy.linspace(0.0, 2.0 * math.pi, frame_count, endpoint=False), numpy.zeros(frame_count)
+
+
+def path_pitch_sweep(frame_count, rng):
+    # From the ground to the sky and back, the field of view then covers mostly one color.
+    return numpy.full(frame_count, math.pi / 4), math.pi / 2 * numpy.sin(numpy.linspace(0.0, 2.0 * math.pi, frame_count, endpoint=False))
+
+
+def path_horizon(frame_count, rng):
+    # Turns while the view oscillates across the horizon band, where the colors are blended.
+    t = numpy.linspace(0.0, 2.0 * math.pi, frame_count, endpoint=False)
+    return t, SIZE_HORIZON * numpy.sin(7.0 * t)
+
+
+def path_random_walk(frame_count, rng):
+    # Mouse-like motion, reproducible from the seed.
+    yaw = numpy.cumsum(rng.normal(0.0, 0.05, frame_count))
+    pitch = numpy.clip(numpy.cumsum(rng.normal(0.0, 0.03, frame_count)), -math.pi / 2, math.pi / 2)
+    return yaw, pitch
+
+
+CAMERA_PATHS = {
+    'static': path_static,
+    'sweep': path_sweep,
+    'pitch_sweep': path_pitch_sweep,
+    'horizon': path_horizon,
+    'random_walk': path_random_walk
+}
+
+# Regressions are detected on these frame time statistics.
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms')
+
+
+def parse_size(text):
+    width, _, height = text.partition('x')
+    return int(width), int(height)
+
+
+def case_key(case):
+    lut = case['sky_lut'] if case['sky_lut'] else 'off'
+    key = f'{case["path"]}/{case["width"]}x{case["height"]}/local={case["local_size"][0]}x{case["local_size"][1]}/format={case["output_format"]}/lut={lut}'
+    # Compute keys stay the same as before backends existed, so older baselines remain comparable.
+    if case['backend'] != 'compute':
+        key += f'/backend={case["backend"]}'
+    return key
+
+
+def cases(arguments):
+    for width, height in arguments.resolutions:
+        for backend in arguments.backends:
+            # The local size and the output format only apply to the compute backend.
+            local_sizes = arguments.local_sizes if backend == 'compute' else arguments.local_sizes[:1]
+            output_formats = arguments.output_formats if backend == 'compute' else arguments.output_formats[:1]
+            for local_size in local_sizes:
+                for output_format in output_formats:
+                    for sky_lut in arguments.sky_lut:
+                        for path in arguments.paths:
+                            yield {'path': path, 'width': width, 'height': height, 'backend': backend, 'local_size': list(local_size), 'output_format': output_format, 'sky_lut': sky_lut}
+
+
+def run_case(case, arguments):
+    from scene.sky import SkyScene
+    yaw, pitch = CAMERA_PATHS[case['path']](arguments.frames, numpy.random.default_rng(arguments.seed))
+    scene = SkyScene(backend=case['backend'], local_size=case['local_size'], output_format=case['output_format'], sky_lut=case['sky_lut'] or None)
+    target = OffscreenTarget(case['width'], case['height'])
+
+    def before_paint(index):
+        # The warmup frames stay on the first point of the path.
+        index = max(0, index - arguments.warmup)
+        scene.camera.set_rotation(float(yaw[index]), float(pitch[index]))
+
+    try:
+        frame_times = run_scene(scene, target, arguments.warmup + arguments.frames, before_paint=before_paint, finish=not arguments.no_finish)
+    finally:
+        target.release()
+    return frame_time_summary(frame_times[arguments.warmup:])
+
+
+def environment():
+    from OpenGL.GL import glGetString, GL_VENDOR, GL_RENDERER, GL_VERSION
+    return {
+        'vendor': glGetString(GL_VENDOR).decode('utf-8'),
+        'renderer': glGetString(GL_RENDERER).decode('utf-8'),
+        'version': glGetString(GL_VERSION).decode('utf-8'),
+        'python': platform.python_version(),
+        'machine': platform.machine()
+    }
+
+
+def compare(results, baseline, metric: str, threshold: float):
+    # Returns (key, baseline, current, ratio, regressed) for every case present in both runs.
+    previous = {entry['key']: entry for entry in baseline['results']}
+    rows = []
+    for entry in results['results']:
+        other = previous.get(entry['key'])
+        if other is None or metric not in entry or metric not in other:
+            continue
+        ratio = entry[metric] / other[metric] if other[metric] > 0 else math.inf
+        rows.append((entry['key'], other[metric], entry[metric], ratio, ratio > 1.0 + threshold))
+    return rows
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark SkyScene headlessly along scripted camera paths.')
+    parser.add_argument('--resolutions', type=parse_size, nargs='+', default=[(640, 360), (1280, 720), (1920, 1080)], metavar='WxH')
+    parser.add_argument('--backends', nargs='+', choices=['compute', 'fragment'], default=['compute', 'fragment'], help='sky render backends to compare')
+    parser.add_argument('--local-sizes', type=parse_size, nargs='+', default=[(16, 16)], metavar='XxY', help='compute shader tile sizes')
+    parser.add_argument('--output-formats', nargs='+', choices=OUTPUT_FORMATS, default=['rgba8'])
+    parser.add_argument('--sky-lut', type=int, nargs='+', default=[0], metavar='SIZE', help='sky cube map sizes, 0 evaluates the sky per pixel')
+    parser.add_argument('--paths', nargs='+', choices=sorted(CAMERA_PATHS), default=['sweep', 'random_walk', 'horizon'])
+    parser.add_argument('--frames', type=int, default=120, help='measured frames per case')
+    parser.add_argument('--warmup', type=int, default=10, help='frames rendered before measuring')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random camera paths')
+    parser.add_argument('--no-finish', action='store_true', help='do not wait for each frame to complete on the GPU')
+    parser.add_argument('--output', default=None, help='file to write the results as JSON')
+    parser.add_argument('--baseline', default=None, help='results of a previous run to compare against')
+    parser.add_argument('--metric', choices=METRICS, default='p50_ms', help='frame time statistic compared against the baseline')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown reported as a regression')
+    parser.add_argument('--video-driver', default=None, help='SDL video driver, "offscreen" when no display is available')
+    parser.add_argument('--mesa-override', action='store_true', help='report OpenGL 4.6 on Mesa drivers limited to 4.5, like llvmpipe')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    configure_opengl()
+    configure_video_driver(arguments.video_driver)
+    if arguments.mesa_override:
+        configure_mesa_override()
+
+    window, gl_context = create_context(*max(arguments.resolutions))
+    try:
+        results = {
+            'environment': environment(),
+            'settings': {'frames': arguments.frames, 'warmup': arguments.warmup, 'seed': arguments.seed, 'finish': not arguments.no_finish},
+            'results': []
+        }
+        for case in cases(arguments):
+            entry = dict(key=case_key(case), **case, **run_case(case, arguments))
+            results['results'].append(entry)
+            if entry['frames'] > 0:
+                print(f'{entry["key"]:<60} {entry["fps"]:9.1f} FPS  p50 {entry["p50_ms"]:8.3f} ms  p95 {entry["p95_ms"]:8.3f} ms  p99 {entry["p99_ms"]:8.3f} ms', file=stderr)
+            else:
+                print(f'{entry["key"]:<60} no frames measured', file=stderr)
+    finally:
+        release_context(window, gl_context)
+
+    if arguments.output is not None:
+        with open(arguments.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)
+        if baseline['environment']['renderer'] != results['environment']['renderer']:
+            print(f'Baseline was measured on {baseline["environment"]["renderer"]}, the results are not comparable', file=stderr)
+        rows = compare(results, baseline, arguments.metric, arguments.threshold)
+        regressions = 0
+        for key, previous, current, ratio, regressed in rows:
+            regressions += regressed
+            print(f'{"REGRESSION" if regressed else "ok":<10} {key:<60} {previous:8.3f} -> {current:8.3f} ms ({(ratio - 1.0) * 100.0:+.1f}%)', file=stderr)
+        print(f'{regressions} of {len(rows)} cases regressed by more than {arguments.threshold * 100.0:.0f}% on {arguments.metric}', file=stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sys import exit, stderr
+import numpy
+from scene.sky_model import DEFAULT_SKY, render_panorama
+
+# Output layouts: a binary PPM (P6) header followed by the pixels, or the pixels alone.
+# 16 bit samples are big-endian in both, as PPM requires.
+EXPORT_FORMATS = ('ppm', 'raw')
+
+# Memory map of the output file, opened once per worker process.
+_output = None
+
+
+def output_header(width: int, height: int, format: str, depth: int):
+    if format == 'raw':
+        return b''
+    return f'P6\n{width} {height}\n{(1 << depth) - 1}\n'.encode('ascii')
+
+
+def sample_type(depth: int):
+    return numpy.dtype(numpy.uint8) if depth == 8 else numpy.dtype('>u2')
+
+
+def create_output(path: str, width: int, height: int, format: str, depth: int):
+    # Writes the header and extends the file to its final size without writing the pixels, the file stays sparse
+    # until the workers fill it.
+    header = output_header(width, height, format, depth)
+    with open(path, 'wb') as file:
+        file.write(header)
+        file.truncate(len(header) + width * height * 3 * sample_type(depth).itemsize)
+
+
+def _open_output(path, width, height, format, depth):
+    global _output
+    _output = numpy.memmap(path, dtype=sample_type(depth), mode='r+', offset=len(output_header(width, height, format, depth)), shape=(height, width, 3))
+
+
+def render_band(start: int, stop: int, width: int, height: int, depth: int, rows_per_chunk: int):
+    # Runs in a worker process, only rows_per_chunk rows are held in floating point at a time.
+    maximum = (1 << depth) - 1
+    colors = numpy.empty((min(rows_per_chunk, stop - start), width, 3), dtype=numpy.float32)
+    for chunk_start in range(start, stop, rows_per_chunk):
+        chunk_stop = min(chunk_start + rows_per_chunk, stop)
+        chunk = colors[:chunk_stop - chunk_start]
+        render_panorama(width, height, chunk_start, chunk_stop, chunk, sky=DEFAULT_SKY, rows_per_chunk=rows_per_chunk)
+        numpy.clip(chunk, 0.0, 1.0, out=chunk)
+        chunk *= maximum
+        # Rounds like an UNORM texture, see to_rgb8().
+        _output[chunk_start:chunk_stop] = numpy.rint(chunk)
+    # The band is only reported complete once its pixels reached the file.
+    _output.flush()
+    return start, stop
+
+
+class Progress:
+    # Completed bands of an export, kept next to the output so an interrupted export continues where it stopped.
+    # The file is replaced atomically, so a crash leaves either the previous or the new state.
+    def __init__(self, path: str, parameters: dict):
+        self.path = path
+        # Normalized through JSON, tuples become lists, so they compare equal to the loaded ones.
+        self.parameters = json.loads(json.dumps(parameters))
+        self.completed = set()
+
+    def load(self):
+        # Returns False when there is nothing to resume, or it belongs to an export with other parameters.
+        try:
+            with open(self.path) as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if state.get('parameters') != self.parameters:
+            return False
+        self.completed = set(state['completed'])
+        return True
+
+    def save(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'parameters': self.parameters, 'completed': sorted(self.completed)}, file)
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def parse_size(text):
+    width, _, height = text.partition('x')
+    return int(width), int(height)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Export an equirectangular panorama of the sky, rendered in row bands on a process pool.')
+    parser.add_argument('output', help='file to write, its size is fixed before rendering and the workers write into it in place')
+    parser.add_argument('--size', type=parse_size, default=(16384, 8192), metavar='WIDTHxHEIGHT')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default=None, help='PPM header and pixels, or only the RGB pixels, default from the extension')
+    parser.add_argument('--depth', type=int, choices=[8, 16], default=8, help='bits per sample')
+    parser.add_argument('--band-rows', type=int, default=256, help='rows rendered by one task')
+    parser.add_argument('--chunk-rows', type=int, default=16, help='rows a worker holds in floating point at a time')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, the number of CPUs by default')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted export with the same parameters, skipping the completed bands')
+    parser.add_argument('--report-interval', type=float, default=2.0, help='seconds between progress reports')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    width, height = arguments.size
+    format = arguments.format
+    if format is None:
+        format = 'ppm' if arguments.output.lower().endswith('.ppm') else 'raw'
+    depth = arguments.depth
+    # Bands are identified by their first row, the parameters decide whether a previous progress file still applies.
+    parameters = {'width': width, 'height': height, 'format': format, 'depth': depth, 'band_rows': arguments.band_rows, 'sky': list(DEFAULT_SKY)}
+    progress = Progress(arguments.output + '.progress', parameters)
+    size = len(output_header(width, height, format, depth)) + width * height * 3 * sample_type(depth).itemsize
+    if arguments.resume and progress.load() and os.path.exists(arguments.output) and os.path.getsize(arguments.output) == size:
+        print(f'Resuming, {len(progress.completed)} bands already rendered', file=stderr)
+    else:
+        progress.completed = set()
+        create_output(arguments.output, width, height, format, depth)
+        progress.save()
+
+    bands = [(start, min(start + arguments.band_rows, height)) for start in range(0, height, arguments.band_rows)]
+    remaining = [band for band in bands if band[0] not in progress.completed]
+    total_pixels = sum((stop - start) * width for start, stop in remaining)
+    rendered_pixels = 0
+    start_time = time.perf_counter()
+    report_time = start_time
+    with ProcessPoolExecutor(arguments.workers, initializer=_open_output, initargs=(arguments.output, width, height, format, depth)) as executor:
+        futures = [executor.submit(render_band, start, stop, width, height, depth, arguments.chunk_rows) for start, stop in remaining]
+        for future in as_completed(futures):
+            start, stop = future.result()
+            progress.completed.add(start)
+            progress.save()
+            rendered_pixels += (stop - start) * width
+            now = time.perf_counter()
+            if now - report_time >= arguments.report_interval:
+                report_time = now
+                rate = rendered_pixels / (now - start_time) / 1e6
+                eta = (total_pixels - rendered_pixels) / (rate * 1e6) if rate > 0 else 0.0
+                print(f'{len(progress.completed)}/{len(bands)} bands, {rate:.1f} MP/s, {eta:.0f} s left', file=stderr)
+    elapsed = time.perf_counter() - start_time
+    progress.remove()
+    rate = rendered_pixels / elapsed / 1e6 if elapsed > 0 else 0.0
+    print(f'{width}x{height} panorama, {rendered_pixels / 1e6:.1f} MP rendered in {elapsed:.2f} s, {rate:.1f} MP/s', file=stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
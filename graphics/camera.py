@@ -1,25 +1,91 @@
 import math
 import numpy
 import threading
+from collections import namedtuple
+
+# Immutable state of a camera, published as a whole, so a renderer never sees half of an update.
+CameraSnapshot = namedtuple('CameraSnapshot', [
+    'version',
+    'screen_width',
+    'screen_height',
+    'view_width',
+    'view_height',
+    'position',
+    'view_front',
+    'view_up',
+    'view_right',
+    'screen_center'
+])
+
+
+def _rotation(cos_yaw, sin_yaw, cos_pitch, sin_pitch, cos_roll, sin_roll):
+    # Row-major elements of yaw * pitch * roll, where:
+    # yaw = [[cos, sin, 0], [-sin, cos, 0], [0, 0, 1]]
+    # pitch = [[1, 0, 0], [0, cos, sin], [0, -sin, cos]]
+    # roll = [[cos, 0, -sin], [0, 1, 0], [sin, 0, cos]]
+    return (
+        cos_yaw * cos_roll + sin_yaw * sin_pitch * sin_roll,
+        sin_yaw * cos_pitch,
+        sin_yaw * sin_pitch * cos_roll - cos_yaw * sin_roll,
+        cos_yaw * sin_pitch * sin_roll - sin_yaw * cos_roll,
+        cos_yaw * cos_pitch,
+        sin_yaw * sin_roll + cos_yaw * sin_pitch * cos_roll,
+        cos_pitch * sin_roll,
+        -sin_pitch,
+        cos_pitch * cos_roll
+    )
+
+
+def _transform(m, v):
+    return (
+        m[0] * v[0] + m[1] * v[1] + m[2] * v[2],
+        m[3] * v[0] + m[4] * v[1] + m[5] * v[2],
+        m[6] * v[0] + m[7] * v[1] + m[8] * v[2]
+    )
+
+
+def _cross(a, b):
+    return (
+        a[1] * b[2] - a[2] * b[1],
+        a[2] * b[0] - a[0] * b[2],
+        a[0] * b[1] - a[1] * b[0]
+    )
+
+
+def view_size(width: int, height: int, field_of_view: float, screen_distance: float = 1.0):
+    # Half extents of the screen rectangle, the field of view spans its diagonal.
+    half_diagonal = math.atan(field_of_view / 2.0) * screen_distance
+    aspect_ratio = width / height
+    view_height = half_diagonal / math.sqrt(1 + aspect_ratio ** 2)
+    return aspect_ratio * view_height, view_height
+
+
+def view_bases(yaw, pitch, roll=0.0, *, world_front=(0.0, 1.0, 0.0), world_up=(0.0, 0.0, 1.0)):
+    # The view basis of MouseCamera for N poses at once: yaw, pitch and roll broadcast to a common shape,
+    # the result is (front, up, right), each with an additional last axis of size 3.
+    yaw, pitch, roll = numpy.broadcast_arrays(*(numpy.asarray(angle, dtype=numpy.float64) for angle in (yaw, pitch, roll)))
+    m = _rotation(numpy.cos(yaw), numpy.sin(yaw), numpy.cos(pitch), numpy.sin(pitch), numpy.cos(roll), numpy.sin(roll))
+    front = numpy.stack(_transform(m, world_front), axis=-1)
+    up = numpy.stack(_transform(m, world_up), axis=-1)
+    return front, up, numpy.cross(front, up)
 
 
 class MouseCamera:
     def __init__(self, *, x=0.0, y=0.0, z=0.0, yaw=0.0, pitch=0.0, roll=0.0, world_front=[0.0, 1.0, 0.0], world_up=[0.0, 0.0, 1.0], width=800, height=600, field_of_view=numpy.deg2rad(60.0), screen_distance=1.0):
-        self.position = numpy.array([x, y, z], dtype=numpy.float32)
-        self.world_front = numpy.array(list(world_front), dtype=numpy.float32)
-        self.world_up = numpy.array(list(world_up), dtype=numpy.float32)
+        self.position = (float(x), float(y), float(z))
+        self.world_front = tuple(float(value) for value in world_front)
+        self.world_up = tuple(float(value) for value in world_up)
 
         self.yaw = yaw
         self.pitch = pitch
         self.roll = roll
 
-        self.view_front = world_front.copy()
-        self.view_up = world_up.copy()
-        self.view_right = numpy.cross(self.view_front, self.view_up)
-
         self.screen_width = width
         self.screen_height = height
         self.lock = threading.RLock()
+        # Incremented on every change, so renderers can skip uploading an unchanged camera.
+        self.version = 0
+        self.snapshot = None
 
         self.screen_distance = screen_distance
         self.field_of_view = field_of_view
@@ -28,40 +94,57 @@ class MouseCamera:
 
     def update(self):
         with self.lock:
-            cos_yaw = math.cos(self.yaw)
-            sin_yaw = math.sin(self.yaw)
-            cos_pitch = math.cos(self.pitch)
-            sin_pitch = math.sin(self.pitch)
-            cos_roll = math.cos(self.roll)
-            sin_roll = math.sin(self.roll)
-
-            mat_yaw = numpy.array([
-                [cos_yaw, sin_yaw, 0.0],
-                [-sin_yaw, cos_yaw, 0.0],
-                [0.0, 0.0, 1.0]
-            ], dtype=numpy.float32)
-
-            mat_pitch = numpy.array([
-                [1.0, 0.0, 0.0],
-                [0.0, cos_pitch, sin_pitch],
-                [0.0, -sin_pitch, cos_pitch]
-            ], dtype=numpy.float32)
-
-            mat_roll = numpy.array([
-                [cos_roll, 0.0, -sin_roll],
-                [0.0, 1.0, 0.0],
-                [sin_roll, 0.0, cos_roll]
-            ], dtype=numpy.float32)
-
-            mat = numpy.matmul(numpy.matmul(mat_yaw, mat_pitch), mat_roll)
-            self.view_front = numpy.matmul(mat, self.world_front)
-            self.view_up = numpy.matmul(mat, self.world_up)
-            self.view_right = numpy.cross(self.view_front, self.view_up)
-
-            half_diagonal = math.atan(self.field_of_view / 2.0) * self.screen_distance
-            aspect_ratio = self.screen_width / self.screen_height
-            self.view_height = half_diagonal / math.sqrt(1 + aspect_ratio ** 2)
-            self.view_width = aspect_ratio * self.view_height
+            m = _rotation(math.cos(self.yaw), math.sin(self.yaw), math.cos(self.pitch), math.sin(self.pitch), math.cos(self.roll), math.sin(self.roll))
+            view_front = _transform(m, self.world_front)
+            view_up = _transform(m, self.world_up)
+            view_right = _cross(view_front, view_up)
+            position = self.position
+            screen_center = (
+                position[0] + self.screen_distance * view_front[0],
+                position[1] + self.screen_distance * view_front[1],
+                position[2] + self.screen_distance * view_front[2]
+            )
+
+            view_width, view_height = view_size(self.screen_width, self.screen_height, self.field_of_view, self.screen_distance)
+
+            self.version += 1
+            # A single attribute assignment, readers get either the previous or the new state.
+            self.snapshot = CameraSnapshot(
+                self.version,
+                self.screen_width,
+                self.screen_height,
+                view_width,
+                view_height,
+                position,
+                view_front,
+                view_up,
+                view_right,
+                screen_center
+            )
+
+    @property
+    def view_front(self):
+        return self.snapshot.view_front
+
+    @property
+    def view_up(self):
+        return self.snapshot.view_up
+
+    @property
+    def view_right(self):
+        return self.snapshot.view_right
+
+    @property
+    def view_width(self):
+        return self.snapshot.view_width
+
+    @property
+    def view_height(self):
+        return self.snapshot.view_height
+
+    @property
+    def screen_center(self):
+        return self.snapshot.screen_center
 
     def set_screen_size(self, width: int, height: int):
         with self.lock:
@@ -69,7 +152,14 @@ class MouseCamera:
             self.screen_height = height
             self.update()
 
+    def set_rotation(self, yaw: float, pitch: float):
+        with self.lock:
+            self.yaw = yaw % (math.pi * 2)
+            self.pitch = max(min(pitch, math.pi / 2), -math.pi / 2)
+            self.update()
+
     def rotate(self, delta_yaw: float, delta_pitch: float):
-        self.yaw = (self.yaw + delta_yaw) % (math.pi * 2)
-        self.pitch = max(min(self.pitch + delta_pitch, math.pi / 2), -math.pi / 2)
-        self.update()
\ No newline at end of file
+        with self.lock:
+            self.yaw = (self.yaw + delta_yaw) % (math.pi * 2)
+            self.pitch = max(min(self.pitch + delta_pitch, math.pi / 2), -math.pi / 2)
+            self.update()
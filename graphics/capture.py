@@ -0,0 +1,91 @@
+import ctypes
+import numpy
+from OpenGL.GL import *
+from graphics.writer import FrameWriter
+
+
+class FrameCapture:
+    # Reads the color buffer back through a ring of `count` regions of a persistently mapped pixel buffer.
+    # glReadPixels() into a buffer object returns immediately, a fence tells when the copy completed,
+    # typically `count - 1` frames later, and only then are the pixels copied out and handed to the writer.
+    def __init__(self, writer: FrameWriter, *, count: int = 3):
+        self.writer = writer
+        self.count = count
+        self.index = 0
+        self.dropped = 0
+        self.size = (0, 0)
+        self.buffer = None
+        self.memory = None
+        self._region = 0
+        # (region, fence, frame index, width, height), oldest first.
+        self._pending = []
+
+    def _allocate(self, width, height):
+        # The pending readbacks use the current layout of the buffer, they must complete first.
+        self.flush()
+        self._release_buffer()
+        self.size = (width, height)
+        self.stride = width * height * 4
+        self.buffer = GLuint()
+        glCreateBuffers(1, self.buffer)
+        flags = GL_MAP_READ_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+        glNamedBufferStorage(self.buffer, self.stride * self.count, None, flags)
+        pointer = glMapNamedBufferRange(self.buffer, 0, self.stride * self.count, flags)
+        self.memory = numpy.ctypeslib.as_array((ctypes.c_ubyte * (self.stride * self.count)).from_address(pointer))
+
+    def capture(self, framebuffer: int, width: int, height: int):
+        # Starts reading the read buffer of `framebuffer`, returns False if the frame was dropped.
+        index = self.index
+        self.index += 1
+        if (width, height) != self.size:
+            self._allocate(width, height)
+        self.poll()
+        if len(self._pending) == self.count:
+            if self.writer.policy == 'drop':
+                self.dropped += 1
+                return False
+            self._complete(GL_TIMEOUT_IGNORED)
+        region = self._region
+        self._region = (self._region + 1) % self.count
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, framebuffer)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffer)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glReadPixels(0, 0, width, height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(region * self.stride))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
+        self._pending.append((region, glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0), index, width, height))
+        return True
+
+    def poll(self):
+        # Hands the completed readbacks to the writer without waiting for the GPU.
+        while self._pending and self._complete(0):
+            pass
+
+    def _complete(self, timeout):
+        region, fence, index, width, height = self._pending[0]
+        status = glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, timeout)
+        if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+            return False
+        self._pending.pop(0)
+        glDeleteSync(fence)
+        offset = region * self.stride
+        pixels = self.memory[offset:offset + self.stride].reshape(height, width, 4).copy()
+        self.writer.submit(index, pixels)
+        return True
+
+    def flush(self):
+        # Waits for all readbacks in flight, e.g. before a resize or at the end of a recording.
+        while self._pending:
+            self._complete(GL_TIMEOUT_IGNORED)
+
+    def _release_buffer(self):
+        if self.buffer is not None:
+            self.memory = None
+            glUnmapNamedBuffer(self.buffer)
+            glDeleteBuffers(1, [self.buffer.value])
+            self.buffer = None
+            self.size = (0, 0)
+
+    def release(self):
+        self.flush()
+        self._release_buffer()
@@ -0,0 +1,16 @@
+# Options shared by the command line tools, without importing OpenGL, which must wait for configure_opengl().
+
+# Image formats usable as compute shader output and their bytes per texel. The name is the GLSL layout qualifier,
+# and the sized internal format with a GL_ prefix, see IMAGE_FORMATS in graphics/texture.py.
+OUTPUT_FORMATS = {
+    'rgba8': 4,
+    'rgb10_a2': 4,
+    'rgba16f': 8,
+    'rgba32f': 16
+}
+
+# How the storage follows the requested size:
+# 'exact' reallocates on every change, 'grow' only when the size exceeds the allocation,
+# 'bucket' rounds the allocation up to a multiple of BUCKET_SIZE and reallocates when the rounded size changes.
+STORAGE_POLICIES = ('exact', 'grow', 'bucket')
+BUCKET_SIZE = 256
@@ -1,4 +1,16 @@
+import os
+import re
 from OpenGL.GL import *
+from OpenGL.GL.KHR.parallel_shader_compile import glMaxShaderCompilerThreadsKHR, GL_COMPLETION_STATUS_KHR
+# The wrapped glGetProgramiv() does not know the result size of GL_COMPLETION_STATUS_KHR, the raw entry point does not need it.
+from OpenGL.raw.GL.VERSION.GL_2_0 import glGetProgramiv as _glGetProgramiv
+
+_INCLUDE = re.compile(r'^\s*#\s*include\s+"([^"]+)"\s*$')
+# Relative shader filenames are resolved in the source tree, not in the working directory.
+SHADER_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shader')
+# Set by gl_parallel_shader_compile(), all contexts of the process use the same driver.
+_parallel_shader_compile = False
+
 
 class ShaderCompileError(Exception):
     def __init__(self, file, log):
@@ -12,6 +24,52 @@ class ProgramLinkError(Exception):
         super().__init__(f'Failed to link OpenGL program:\n{log}')
 
 
+def gl_shader_source_with_includes(source, directory: str, _included=None):
+    # Resolves #include "file" lines relative to directory, GLSL has no includes without ARB_shading_language_include.
+    if isinstance(source, bytes):
+        source = source.decode('utf-8')
+    included = _included if _included is not None else set()
+    lines = []
+    for number, line in enumerate(source.split('\n'), 1):
+        match = _INCLUDE.match(line)
+        if match is None:
+            lines.append(line)
+            continue
+        filename = os.path.normpath(os.path.join(directory, match.group(1)))
+        if filename in included:
+            # Each file is included once, like with #pragma once.
+            lines.append('')
+            continue
+        included.add(filename)
+        with open(filename, 'rb') as file:
+            content = gl_shader_source_with_includes(file.read(), os.path.dirname(filename), included)
+        lines.extend(['#line 1', content, f'#line {number + 1}'])
+    return '\n'.join(lines)
+
+
+def gl_read_shader_source(filename: str, files: set = None):
+    # When given, `files` receives the paths of the shader and of every file it includes, e.g. to watch them.
+    filename = os.path.normpath(os.path.join(SHADER_DIRECTORY, filename))
+    included = {filename}
+    with open(filename, 'rb') as file:
+        source = gl_shader_source_with_includes(file.read(), os.path.dirname(filename), included)
+    if files is not None:
+        files.update(included)
+    return source
+
+
+def gl_shader_source_with_defines(source, defines: dict):
+    # GLSL requires #version to be the first directive, so the defines are inserted right after it.
+    if isinstance(source, bytes):
+        source = source.decode('utf-8')
+    lines = [f'#define {name} {value}' for name, value in defines.items()]
+    head, _, tail = source.partition('\n')
+    if head.lstrip().startswith('#version'):
+        # Restore the line numbering, so compile errors still point at the original source.
+        return '\n'.join([head, *lines, '#line 2', tail])
+    return '\n'.join([*lines, '#line 1', source])
+
+
 def gl_create_shader_from_file(type: int, filename: str):
     shader = glCreateShader(type)
     with open(filename, 'rb') as file:
@@ -36,8 +94,11 @@ def gl_create_shader_from_source(type: int, source: str):
     return shader
 
 
-def gl_create_program(*shaders):
+def gl_create_program(*shaders, retrievable=False):
     program = glCreateProgram()
+    if retrievable:
+        # Required before linking, so glGetProgramBinary() can return the binary afterwards.
+        glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
     for shader in shaders:
         glAttachShader(program, shader)
     glLinkProgram(program)
@@ -52,6 +113,84 @@ def gl_create_program(*shaders):
     return program
 
 
+def gl_has_extension(name: str):
+    if isinstance(name, str):
+        name = name.encode('utf-8')
+    return any(glGetStringi(GL_EXTENSIONS, index) == name for index in range(glGetIntegerv(GL_NUM_EXTENSIONS)))
+
+
+def gl_parallel_shader_compile():
+    # Lets the driver compile and link on its own threads, for the current context. Returns whether it is supported,
+    # only then can the completion of a PendingProgram be polled without blocking.
+    global _parallel_shader_compile
+    _parallel_shader_compile = gl_has_extension('GL_KHR_parallel_shader_compile')
+    if _parallel_shader_compile:
+        glMaxShaderCompilerThreadsKHR(0xFFFFFFFF)
+    return _parallel_shader_compile
+
+
+class PendingProgram:
+    # A program whose compile and link were issued, but whose status was not queried yet: the first status query
+    # waits for the driver. With GL_KHR_parallel_shader_compile, is_complete() tells when it would not wait.
+    def __init__(self, shaders, *, retrievable=False, on_link=None):
+        self.shaders = []
+        for type, source in shaders:
+            shader = glCreateShader(type)
+            glShaderSource(shader, source)
+            glCompileShader(shader)
+            self.shaders.append(shader)
+        self.program = glCreateProgram()
+        if retrievable:
+            glProgramParameteri(self.program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+        for shader in self.shaders:
+            glAttachShader(self.program, shader)
+        glLinkProgram(self.program)
+        self.on_link = on_link
+
+    @classmethod
+    def ready(cls, program):
+        pending = cls.__new__(cls)
+        pending.shaders = []
+        pending.program = program
+        pending.on_link = None
+        return pending
+
+    def is_complete(self):
+        if not _parallel_shader_compile or not self.shaders:
+            return True
+        status = GLint()
+        _glGetProgramiv(self.program, GL_COMPLETION_STATUS_KHR, status)
+        return bool(status.value)
+
+    def result(self):
+        # Returns the linked program, or raises the same errors as gl_create_shader_from_source() and gl_create_program().
+        if not self.shaders:
+            return self.program
+        shaders, self.shaders = self.shaders, []
+        for shader in shaders:
+            if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+                log = glGetShaderInfoLog(shader)
+                glDeleteProgram(self.program)
+                for shader in shaders:
+                    glDeleteShader(shader)
+                raise ShaderCompileError('=SOURCE=', log)
+        if not glGetProgramiv(self.program, GL_LINK_STATUS):
+            log = glGetProgramInfoLog(self.program)
+            glDeleteProgram(self.program)
+            for shader in shaders:
+                glDeleteShader(shader)
+            raise ProgramLinkError(log)
+        if self.on_link is not None:
+            self.on_link(self.program)
+        return self.program
+
+
+def gl_delete_program(program):
+    for shader in glGetAttachedShaders(program):
+        glDeleteShader(shader)
+    glDeleteProgram(program)
+
+
 def gl_get_program_uniforms(program):
     uniforms = {}
     count = glGetProgramiv(program, GL_ACTIVE_UNIFORMS)
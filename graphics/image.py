@@ -0,0 +1,39 @@
+import struct
+import zlib
+import numpy
+
+
+def write_ppm(filename: str, pixels: numpy.ndarray):
+    # Pixels are expected as (height, width, 3) unsigned bytes, top row first.
+    height, width = pixels.shape[:2]
+    with open(filename, 'wb') as file:
+        file.write(f'P6\n{width} {height}\n255\n'.encode('ascii'))
+        file.write(numpy.ascontiguousarray(pixels[:, :, :3], dtype=numpy.uint8).tobytes())
+
+
+def to_rgb8(pixels: numpy.ndarray, *, flip: bool = True):
+    # Converts floating point (height, width, 3 or 4) colors to unsigned bytes, rounding like an UNORM8 texture.
+    # OpenGL rows go bottom-up, so by default the rows are flipped to get a top-down image.
+    if flip:
+        pixels = pixels[::-1]
+    result = numpy.clip(pixels[:, :, :3], 0.0, 1.0) * 255.0
+    return numpy.rint(result).astype(numpy.uint8)
+
+
+def write_png(filename: str, pixels: numpy.ndarray, *, level: int = 1):
+    # Pixels are expected as (height, width, 3 or 4) unsigned bytes, top row first. Rows use filter type 0 (none),
+    # with a low compression level the encoding stays cheap enough for a background writer.
+    height, width, channels = pixels.shape
+    rows = numpy.empty((height, 1 + width * channels), dtype=numpy.uint8)
+    rows[:, 0] = 0
+    rows[:, 1:] = numpy.ascontiguousarray(pixels, dtype=numpy.uint8).reshape(height, width * channels)
+    color_type = 6 if channels == 4 else 2
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    with open(filename, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)))
+        file.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), level)))
+        file.write(chunk(b'IEND', b''))
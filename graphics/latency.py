@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import deque
+import numpy
+from OpenGL.GL import *
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyTracker:
+    # Input-to-photon latency: input() is called by the event thread with the time SDL received the event, latch()
+    # by the draw thread when it applies the input to the scene, and the latched timestamp is passed on with the frame.
+    # 'swap' is measured when SDL_GL_SwapWindow() returns, 'complete' when the GPU finished that frame,
+    # which is the closest to the display the application can observe, as seen by the next FrameLimiter.poll().
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self.samples = {name: numpy.full(capacity, numpy.nan, dtype=numpy.float64) for name in ('swap', 'complete')}
+        self.counts = {name: 0 for name in self.samples}
+        self._lock = threading.Lock()
+        self._pending = None
+
+    def input(self, timestamp: int = None):
+        # Only the oldest input not yet latched matters, the first frame reflecting it reflects the later ones as well.
+        timestamp = timestamp if timestamp is not None else time.perf_counter_ns()
+        with self._lock:
+            if self._pending is None:
+                self._pending = timestamp
+
+    def latch(self):
+        # Returns the timestamp of the oldest input applied from now on, or None.
+        with self._lock:
+            timestamp, self._pending = self._pending, None
+        return timestamp
+
+    def record(self, name: str, input_time: int, now: int = None):
+        now = now if now is not None else time.perf_counter_ns()
+        self.samples[name][self.counts[name] % self.capacity] = (now - input_time) / 1e6
+        self.counts[name] += 1
+
+    def summary(self):
+        result = {}
+        for name, values in self.samples.items():
+            valid = values[~numpy.isnan(values)]
+            if valid.size == 0:
+                continue
+            entry = {'count': int(valid.size), 'mean_ms': float(numpy.mean(valid)), 'max_ms': float(numpy.max(valid))}
+            for percentile, value in zip(PERCENTILES, numpy.percentile(valid, PERCENTILES)):
+                entry[f'p{percentile}_ms'] = float(value)
+            result[name] = entry
+        return result
+
+
+class FrameLimiter:
+    # Limits the frames queued on the GPU with a fence after each swap. Drivers commonly queue 2 or 3 frames,
+    # each adding a refresh interval of latency, with 1 the draw thread samples the input only after the previous
+    # frame completed. Without max_frames, the fences are only used to measure the 'complete' latency.
+    def __init__(self, max_frames: int = None, tracker: LatencyTracker = None):
+        self.max_frames = max_frames
+        self.tracker = tracker
+        # (fence, input timestamp or None), oldest first.
+        self._fences = deque()
+
+    def submitted(self, input_time: int = None):
+        # Called right after the swap.
+        self._fences.append((glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0), input_time))
+
+    def _complete(self, timeout):
+        fence, input_time = self._fences[0]
+        status = glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, timeout)
+        if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+            return False
+        self._fences.popleft()
+        glDeleteSync(fence)
+        if input_time is not None and self.tracker is not None:
+            self.tracker.record('complete', input_time)
+        return True
+
+    def poll(self):
+        while self._fences and self._complete(0):
+            pass
+
+    def wait(self):
+        # Called before a frame is started, blocks until fewer than max_frames are in flight.
+        self.poll()
+        while self.max_frames is not None and len(self._fences) >= self.max_frames:
+            self._complete(GL_TIMEOUT_IGNORED)
+
+    def release(self):
+        while self._fences:
+            glDeleteSync(self._fences.popleft()[0])
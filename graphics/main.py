@@ -1,14 +1,24 @@
 import __main__
+from OpenGL.GL import *
+from graphics.gl import gl_parallel_shader_compile
+from graphics.startup import resolve_functions
 
 def on_initialize():
-    pass
+    resolve_functions()
+    gl_parallel_shader_compile()
+    __main__.gl_framebuffer = glGenFramebuffers(1)
+
+    glHint(GL_LINE_SMOOTH_HINT, GL_NICEST)
+    glHint(GL_POLYGON_SMOOTH_HINT, GL_NICEST)
+    glHint(GL_TEXTURE_COMPRESSION_HINT, GL_NICEST)
+    glHint(GL_FRAGMENT_SHADER_DERIVATIVE_HINT, GL_NICEST)
 
 def on_release():
-    pass
+    glDeleteFramebuffers(1, [__main__.gl_framebuffer])
+    __main__.gl_framebuffer = None
 
 def on_resize():
     pass
 
 def on_paint():
     pass
-
@@ -0,0 +1,208 @@
+import ctypes
+import csv
+import json
+import time
+from collections import deque
+import numpy
+from OpenGL.GL import *
+# The wrapped glGetQueryObjectui64v() fails to map GL_UNSIGNED_INT64 to a NumPy type, the raw entry point does not.
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v as _glGetQueryObjectui64v
+
+PERCENTILES = (50, 95, 99)
+
+
+class GpuTimer:
+    # GL_TIMESTAMP queries which never stall the pipeline: a result is only read once the driver reports it available,
+    # typically a few frames after it was issued.
+    def __init__(self):
+        self._free = []
+        self._pending = deque()
+        self._result = ctypes.c_uint64()
+
+    def _query(self):
+        if not self._free:
+            self._free.extend(int(query) for query in glGenQueries(16))
+        return self._free.pop()
+
+    def timestamp(self):
+        query = self._query()
+        glQueryCounter(query, GL_TIMESTAMP)
+        return query
+
+    def submit(self, key, start_query: int, end_query: int):
+        # The elapsed time between the two timestamps is returned by poll() as (key, nanoseconds).
+        self._pending.append((key, start_query, end_query))
+
+    def poll(self):
+        results = []
+        while self._pending:
+            key, start_query, end_query = self._pending[0]
+            # Queries complete in order, if the last one is not available, neither are the following.
+            if not glGetQueryObjectiv(end_query, GL_QUERY_RESULT_AVAILABLE):
+                break
+            self._pending.popleft()
+            _glGetQueryObjectui64v(start_query, GL_QUERY_RESULT, ctypes.byref(self._result))
+            start = self._result.value
+            _glGetQueryObjectui64v(end_query, GL_QUERY_RESULT, ctypes.byref(self._result))
+            results.append((key, self._result.value - start))
+            self._free.append(start_query)
+            self._free.append(end_query)
+        return results
+
+    def release(self):
+        queries = self._free + [query for _, start, end in self._pending for query in (start, end)]
+        if queries:
+            glDeleteQueries(len(queries), queries)
+        self._free = []
+        self._pending.clear()
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'cpu_start', 'gpu_start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.gpu_start = self.profiler.gpu.timestamp()
+        self.cpu_start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exception):
+        cpu_end = time.perf_counter_ns()
+        profiler = self.profiler
+        profiler.gpu.submit((profiler.frame, self.name), self.gpu_start, profiler.gpu.timestamp())
+        profiler._record('cpu', profiler.frame, self.name, cpu_end - self.cpu_start)
+        return False
+
+
+class FrameProfiler:
+    # Records CPU and GPU durations of named phases in a ring buffer of the last `capacity` frames.
+    # Phases may nest, the 'frame' phase spans from begin_frame() to end_frame().
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.frame = -1
+        self.gpu = None
+        self.frames = numpy.full(capacity, -1, dtype=numpy.int64)
+        self.samples = {'cpu': {}, 'gpu': {}}
+        self._latest = {}
+        self._frame_span = None
+
+    def phase(self, name: str):
+        # A span per use, a phase nested in one with the same name keeps its own start times.
+        return _Span(self, name)
+
+    def collect(self):
+        # Records the GPU results which became available since the last call.
+        for (frame, name), elapsed in self.gpu.poll():
+            self._record('gpu', frame, name, elapsed)
+
+    def begin_frame(self):
+        if self.gpu is None:
+            # Created on first use, so the profiler can be constructed before the OpenGL context is current.
+            self.gpu = GpuTimer()
+        self.collect()
+        self.frame += 1
+        self.frames[self.frame % self.capacity] = self.frame
+        for samples in self.samples.values():
+            for values in samples.values():
+                values[self.frame % self.capacity] = numpy.nan
+        self._frame_span = self.phase('frame')
+        self._frame_span.__enter__()
+
+    def end_frame(self):
+        self._frame_span.__exit__(None, None, None)
+        self._frame_span = None
+
+    def release(self):
+        if self.gpu is not None:
+            self.gpu.release()
+            self.gpu = None
+
+    def _record(self, clock, frame, name, nanoseconds):
+        if frame <= self.frame - self.capacity:
+            # The frame was already overwritten in the ring buffer.
+            return
+        samples = self.samples[clock]
+        values = samples.get(name)
+        if values is None:
+            values = samples[name] = numpy.full(self.capacity, numpy.nan, dtype=numpy.float64)
+        values[frame % self.capacity] = nanoseconds / 1e6
+        self._latest[(clock, name)] = nanoseconds / 1e6
+
+    def latest(self, clock: str, name: str):
+        # The most recent completed measurement in milliseconds, or None.
+        return self._latest.get((clock, name))
+
+    def summary(self):
+        result = {}
+        for clock, samples in self.samples.items():
+            for name, values in samples.items():
+                valid = values[~numpy.isnan(values)]
+                if valid.size == 0:
+                    continue
+                entry = {'count': int(valid.size), 'mean_ms': float(numpy.mean(valid))}
+                for percentile, value in zip(PERCENTILES, numpy.percentile(valid, PERCENTILES)):
+                    entry[f'p{percentile}_ms'] = float(value)
+                result.setdefault(name, {})[clock] = entry
+        return result
+
+    def rows(self):
+        columns = [(clock, name) for clock, samples in self.samples.items() for name in sorted(samples)]
+        indices = [index for index in numpy.argsort(self.frames) if self.frames[index] >= 0]
+        for index in indices:
+            yield int(self.frames[index]), [self.samples[clock][name][index] for clock, name in columns]
+
+    def dump(self, filename: str):
+        # JSON gets the summary and the samples, anything else is written as CSV with one row per frame.
+        columns = [f'{name}_{clock}_ms' for clock, samples in self.samples.items() for name in sorted(samples)]
+        if filename.endswith('.json'):
+            frames = [
+                dict(frame=frame, **{column: (None if numpy.isnan(value) else float(value)) for column, value in zip(columns, values)})
+                for frame, values in self.rows()
+            ]
+            with open(filename, 'w') as file:
+                json.dump({'summary': self.summary(), 'frames': frames}, file, indent=2)
+        else:
+            with open(filename, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['frame', *columns])
+                for frame, values in self.rows():
+                    writer.writerow([frame, *['' if numpy.isnan(value) else f'{value:.6f}' for value in values]])
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+class NullProfiler:
+    # Used when profiling is disabled, every method is a no-op.
+    _span = _NullSpan()
+
+    def phase(self, name: str):
+        return self._span
+
+    def begin_frame(self):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def collect(self):
+        pass
+
+    def release(self):
+        pass
+
+    def latest(self, clock: str, name: str):
+        return None
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import struct
+import numpy
+from OpenGL.GL import *
+from graphics.gl import gl_create_shader_from_source, gl_create_program, gl_shader_source_with_defines, PendingProgram
+
+
+def default_cache_directory():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'gray', 'programs')
+
+
+class ProgramCache:
+    # Entry layout: magic, binary format, payload length, SHA-256 of the payload, payload.
+    MAGIC = b'GRAYPRG1'
+    HEADER = struct.Struct('<8sII32s')
+    EXTENSION = '.bin'
+
+    def __init__(self, directory: str = None, *, max_size: int = 64 * 1024 * 1024):
+        self.directory = directory if directory is not None else default_cache_directory()
+        self.max_size = max_size
+        self._driver = None
+        self._supported = None
+
+    def _driver_key(self):
+        # The binary is only valid for the exact same driver, which must be part of the key.
+        if self._driver is None:
+            self._driver = b'\0'.join(glGetString(name) or b'' for name in (GL_VENDOR, GL_RENDERER, GL_VERSION, GL_SHADING_LANGUAGE_VERSION))
+        return self._driver
+
+    def is_supported(self):
+        if self._supported is None:
+            self._supported = glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+        return self._supported
+
+    def key(self, shaders, defines: dict):
+        digest = hashlib.sha256()
+        digest.update(self._driver_key())
+        for name, value in sorted(defines.items()):
+            digest.update(f'\0{name}={value}'.encode('utf-8'))
+        for type, source in shaders:
+            if isinstance(source, str):
+                source = source.encode('utf-8')
+            digest.update(struct.pack('<IQ', type, len(source)))
+            digest.update(source)
+        return digest.hexdigest()
+
+    def create_program(self, shaders, defines: dict = None):
+        # Shaders are (type, source) pairs, the defines are injected in every source.
+        defines = defines or {}
+        if not self.is_supported():
+            return create_program(shaders, defines)
+        filename = os.path.join(self.directory, self.key(shaders, defines) + self.EXTENSION)
+        program = self._load(filename)
+        if program is not None:
+            return program
+        program = gl_create_program(
+            *[gl_create_shader_from_source(type, gl_shader_source_with_defines(source, defines)) for type, source in shaders],
+            retrievable=True
+        )
+        self._store(filename, program)
+        return program
+
+    def create_program_async(self, shaders, defines: dict = None):
+        # Like create_program(), but returns a PendingProgram; a binary from the cache is ready immediately.
+        defines = defines or {}
+        if not self.is_supported():
+            return create_program_async(shaders, defines)
+        filename = os.path.join(self.directory, self.key(shaders, defines) + self.EXTENSION)
+        program = self._load(filename)
+        if program is not None:
+            return PendingProgram.ready(program)
+        return PendingProgram(
+            [(type, gl_shader_source_with_defines(source, defines)) for type, source in shaders],
+            retrievable=True,
+            on_link=lambda program: self._store(filename, program)
+        )
+
+    def _load(self, filename):
+        try:
+            with open(filename, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        if len(data) >= self.HEADER.size:
+            magic, binary_format, length, checksum = self.HEADER.unpack_from(data)
+            payload = data[self.HEADER.size:]
+            if magic == self.MAGIC and length == len(payload) and hashlib.sha256(payload).digest() == checksum:
+                program = glCreateProgram()
+                glProgramBinary(program, binary_format, payload, length)
+                if glGetProgramiv(program, GL_LINK_STATUS):
+                    # Mark the entry as recently used for the eviction.
+                    try:
+                        os.utime(filename)
+                    except OSError:
+                        pass
+                    return program
+                # The driver rejected the binary, e.g. after a driver update with the same version string.
+                glDeleteProgram(program)
+        self._remove(filename)
+        return None
+
+    def _store(self, filename, program):
+        size = glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH)
+        if size <= 0:
+            return
+        length = numpy.zeros(1, dtype=numpy.int32)
+        binary_format = numpy.zeros(1, dtype=numpy.uint32)
+        payload = numpy.empty(size, dtype=numpy.uint8)
+        glGetProgramBinary(program, size, length, binary_format, payload)
+        payload = payload[:int(length[0])].tobytes()
+        header = self.HEADER.pack(self.MAGIC, int(binary_format[0]), len(payload), hashlib.sha256(payload).digest())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write into a temporary file first, so a concurrent reader never sees a partial entry.
+            temporary = f'{filename}.{os.getpid()}.tmp'
+            with open(temporary, 'wb') as file:
+                file.write(header)
+                file.write(payload)
+            os.replace(temporary, filename)
+            self.evict()
+        except OSError:
+            pass
+
+    def _remove(self, filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def evict(self):
+        # Removes the least recently used entries until the cache fits in max_size bytes.
+        entries = []
+        try:
+            with os.scandir(self.directory) as iterator:
+                for entry in iterator:
+                    if entry.name.endswith(self.EXTENSION) and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+
+
+def create_program(shaders, defines: dict = None, cache: ProgramCache = None):
+    if cache is not None:
+        return cache.create_program(shaders, defines)
+    defines = defines or {}
+    return gl_create_program(*[gl_create_shader_from_source(type, gl_shader_source_with_defines(source, defines)) for type, source in shaders])
+
+
+def create_program_async(shaders, defines: dict = None, cache: ProgramCache = None):
+    if cache is not None:
+        return cache.create_program_async(shaders, defines)
+    defines = defines or {}
+    return PendingProgram([(type, gl_shader_source_with_defines(source, defines)) for type, source in shaders])
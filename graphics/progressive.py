@@ -0,0 +1,63 @@
+import math
+
+
+class ProgressiveRefinement:
+    # Splits the frame into tiles of tile_size pixels which are rendered over several frames, as many per frame as
+    # fit in budget_ms of GPU time, estimated from the measured cost of the previous tiles. When the frame does not
+    # fit in the budget, a pass at 1 / preview_block of the resolution covers the screen first.
+    def __init__(self, budget_ms: float = 4.0, *, tile_size=(128, 128), preview_block: int = 8, smoothing: float = 0.25):
+        self.budget_ms = budget_ms
+        self.tile_size = tuple(tile_size)
+        self.preview_block = preview_block
+        self.smoothing = smoothing
+        # Milliseconds per tile and per preview pass, None until measured.
+        self.tile_ms = None
+        self.preview_ms = None
+        self.tiles = []
+        self._next = 0
+
+    def reset(self, width: int, height: int):
+        # Tiles are ordered from the center out, the center of the screen is where the viewer looks.
+        tile_width, tile_height = self.tile_size
+        tiles = [
+            (x, y, min(tile_width, width - x), min(tile_height, height - y))
+            for y in range(0, height, tile_height)
+            for x in range(0, width, tile_width)
+        ]
+        center_x = width * 0.5
+        center_y = height * 0.5
+        tiles.sort(key=lambda tile: math.hypot(tile[0] + tile[2] * 0.5 - center_x, tile[1] + tile[3] * 0.5 - center_y))
+        self.tiles = tiles
+        self._next = 0
+
+    def is_complete(self):
+        return self._next >= len(self.tiles)
+
+    def plan(self, restart: bool):
+        # Returns (preview, tiles) for the next frame. `restart` is set on the first frame after reset().
+        remaining = len(self.tiles) - self._next
+        budget = self.budget_ms
+        preview = False
+        if self.tile_ms is None:
+            # Nothing measured yet, one tile behind a preview gives the first estimates.
+            count = 1
+            preview = restart and remaining > 1
+        else:
+            count = max(1, int(budget / self.tile_ms))
+            if restart and count < remaining:
+                preview = True
+                count = max(1, int((budget - (self.preview_ms or 0.0)) / self.tile_ms))
+        count = min(count, remaining)
+        tiles = self.tiles[self._next:self._next + count]
+        self._next += count
+        return preview, tiles
+
+    def _average(self, current, value):
+        return value if current is None else current + (value - current) * self.smoothing
+
+    def update_tiles(self, count: int, gpu_ms: float):
+        if count > 0:
+            self.tile_ms = self._average(self.tile_ms, gpu_ms / count)
+
+    def update_preview(self, gpu_ms: float):
+        self.preview_ms = self._average(self.preview_ms, gpu_ms)
@@ -0,0 +1,25 @@
+import math
+
+
+class DynamicResolution:
+    # Chooses the render scale from the measured GPU time of the previous frames, so the frame time converges to
+    # target_ms. The cost of a frame is proportional to its pixel count, which is proportional to scale ** 2.
+    def __init__(self, target_ms: float = 8.3, *, minimum_scale: float = 0.5, maximum_scale: float = 1.0, step: float = 1.0 / 32.0, smoothing: float = 0.25):
+        self.target_ms = target_ms
+        self.minimum_scale = minimum_scale
+        self.maximum_scale = maximum_scale
+        # The scale is quantized to step, so small measurement noise does not resize every frame.
+        self.step = step
+        self.smoothing = smoothing
+        self.scale = maximum_scale
+        self._desired = maximum_scale
+
+    def update(self, gpu_ms: float):
+        if gpu_ms <= 0.0:
+            return self.scale
+        desired = self.scale * math.sqrt(self.target_ms / gpu_ms)
+        self._desired += (desired - self._desired) * self.smoothing
+        self._desired = max(self.minimum_scale, min(self.maximum_scale, self._desired))
+        scale = round(self._desired / self.step) * self.step
+        self.scale = max(self.minimum_scale, min(self.maximum_scale, scale))
+        return self.scale
@@ -1,6 +1,41 @@
 from OpenGL.GL import glClearColor, glClear, glViewport, GL_COLOR_BUFFER_BIT
+from graphics.profiler import NULL_PROFILER
 
 class Scene:
+    # Replaced by the draw loop with a FrameProfiler when profiling is enabled.
+    profiler = NULL_PROFILER
+    # Scenes controlled by the mouse expose a MouseCamera.
+    camera = None
+    # Set by the draw loop when late latching: on_paint() calls it right before it reads the camera,
+    # so the input which arrived during the frame still makes it into this frame.
+    input_latch = None
+
+    def on_load(self):
+        # Compiles programs and creates other shareable objects, may run on a worker thread with a shared context.
+        # Framebuffers and vertex arrays are not shared between contexts, those belong in on_initialize().
+        pass
+
+    def is_loaded(self):
+        # Whether on_initialize() can run without waiting for the work started by on_load().
+        return True
+
+    def shader_files(self):
+        # Paths of the shader sources read by on_load(), watched for changes when hot reloading.
+        return ()
+
+    def on_reload(self):
+        # Reads the changed shader sources and compiles them again, may run on a worker thread like on_load().
+        pass
+
+    def is_reloaded(self):
+        # Whether apply_reload() can run without waiting for the work started by on_reload().
+        return True
+
+    def apply_reload(self):
+        # Replaces the programs with the ones compiled by on_reload(), between two frames on the draw thread.
+        # Raises ShaderCompileError or ProgramLinkError and keeps the previous programs if any of them failed.
+        pass
+
     def on_initialize(self):
         glClearColor(0.0, 0.0, 0.0, 1.0)
 
@@ -18,3 +53,12 @@ class Scene:
 
     def on_paint(self):
         glClear(GL_COLOR_BUFFER_BIT)
+
+    def gpu_memory(self):
+        # Estimated bytes of GPU memory held between on_initialize() and on_release(), used by the SceneManager budget.
+        return 0
+
+    def is_dirty(self):
+        # Whether the next on_paint() would produce a different frame. Animated scenes are always dirty,
+        # static scenes override this, so the draw thread can sleep until something changes.
+        return True
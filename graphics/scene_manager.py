@@ -0,0 +1,174 @@
+import threading
+from collections import OrderedDict
+from sys import stderr
+from graphics.scene import Scene
+from graphics.gl import ShaderCompileError, ProgramLinkError
+
+# Errors of a shader reload, e.g. an included file briefly missing while an editor saves, or one half written and not
+# valid UTF-8 yet (UnicodeDecodeError is a ValueError). The previous programs stay in use.
+_RELOAD_ERRORS = (ShaderCompileError, ProgramLinkError, OSError, ValueError)
+
+
+def _print_reload_error(error):
+    print(f'Shader reload failed, keeping the previous program: {error}', file=stderr)
+
+
+class SceneManager:
+    # Owns the lifetime of the OpenGL resources of scenes, all methods except preload() run on the draw thread.
+    # Initialized scenes are kept in least recently used order; when their estimated GPU memory exceeds the budget,
+    # inactive scenes are released, starting with the least recently used one. A released scene is initialized again
+    # when it becomes active.
+    def __init__(self, budget: int = None, worker=None, watcher=None, wake=None):
+        self.budget = budget
+        # Optional GLWorker, without it on_load() runs on the draw thread, which only blocks the switch when the
+        # driver does not support GL_KHR_parallel_shader_compile.
+        self.worker = worker
+        # Optional FileWatcher, the shader files of initialized scenes are watched and the scenes reloaded on a change.
+        self.watcher = watcher
+        # Called from any thread when update() has work, e.g. to wake the draw loop waiting for a redraw.
+        self.wake = wake
+        self.active = None
+        self._scenes = OrderedDict()
+        self._loading = {}
+        self._requests = []
+        self._reloading = {}
+        self._changed = set()
+        self._lock = threading.Lock()
+
+    def preload(self, scene: Scene):
+        # Requests loading and initializing the scene ahead of a switch, safe to call from any thread.
+        with self._lock:
+            self._requests.append(scene)
+
+    def files_changed(self, paths):
+        # Requests reloading the scenes using any of the files, safe to call from any thread, e.g. the watcher's.
+        with self._lock:
+            self._changed.update(paths)
+        if self.wake is not None:
+            self.wake()
+
+    def is_reloading(self):
+        return bool(self._reloading)
+
+    def is_initialized(self, scene: Scene):
+        return scene in self._scenes
+
+    def gpu_memory(self):
+        return sum(scene.gpu_memory() for scene in self._scenes)
+
+    def update(self):
+        # Starts requested loads, initializes the scenes whose load completed and enforces the budget.
+        # Called once per draw loop iteration.
+        with self._lock:
+            requests, self._requests = self._requests, []
+        for scene in requests:
+            if scene not in self._scenes and scene not in self._loading:
+                self._loading[scene] = self.worker.submit(scene.on_load) if self.worker is not None else scene.on_load()
+        for scene, future in list(self._loading.items()):
+            if future is not None and not future.done():
+                continue
+            # A failed load is initialized as well, which raises its error on the draw thread.
+            if (future is not None and future.exception() is not None) or scene.is_loaded():
+                self._initialize(scene)
+        self._update_reloads()
+        # Scenes grow on resize as well, so the budget is checked on every iteration.
+        self.evict()
+
+    def _update_reloads(self):
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        for scene in self._scenes:
+            files = changed.intersection(scene.shader_files())
+            if not files:
+                continue
+            if scene in self._reloading:
+                # One reload at a time per scene, the change is picked up once the current one completed.
+                with self._lock:
+                    self._changed.update(files)
+                continue
+            if self.worker is not None:
+                future = self.worker.submit(scene.on_reload)
+                if self.wake is not None:
+                    future.add_done_callback(lambda future: self.wake())
+                self._reloading[scene] = future
+            else:
+                try:
+                    scene.on_reload()
+                except _RELOAD_ERRORS as error:
+                    _print_reload_error(error)
+                    continue
+                self._reloading[scene] = None
+        for scene, future in list(self._reloading.items()):
+            if future is not None and not future.done():
+                continue
+            if (future is not None and future.exception() is not None) or scene.is_reloaded():
+                self._apply_reload(scene)
+
+    def _apply_reload(self, scene):
+        # The previous programs stay in use when the new sources fail to compile, fixing the source reloads again.
+        future = self._reloading.pop(scene)
+        try:
+            if future is not None:
+                future.result()
+            scene.apply_reload()
+        except _RELOAD_ERRORS as error:
+            _print_reload_error(error)
+        if self.watcher is not None:
+            # Files included by the new sources are watched as well, also when they failed to compile, so fixing an
+            # added include reloads the scene again.
+            self.watcher.watch(scene.shader_files())
+
+    def activate(self, scene: Scene):
+        # Makes the scene the active one, returns True if it had to be initialized.
+        self.active = scene
+        if scene is None:
+            return False
+        initialized = scene not in self._scenes
+        if initialized:
+            if scene not in self._loading:
+                self._loading[scene] = scene.on_load()
+            self._initialize(scene)
+        self._scenes.move_to_end(scene)
+        self.evict()
+        return initialized
+
+    def _initialize(self, scene):
+        future = self._loading.pop(scene)
+        if future is not None:
+            # Raises the error of on_load() on the worker, waits if it did not finish yet.
+            future.result()
+        scene.on_initialize()
+        self._scenes[scene] = True
+        if self.watcher is not None:
+            self.watcher.watch(scene.shader_files())
+
+    def evict(self):
+        if self.budget is None:
+            return
+        total = self.gpu_memory()
+        for scene in list(self._scenes):
+            if total <= self.budget:
+                break
+            if scene is self.active:
+                continue
+            total -= scene.gpu_memory()
+            self.release_scene(scene)
+
+    def release_scene(self, scene: Scene):
+        if scene in self._reloading:
+            self._apply_reload(scene)
+        if scene in self._scenes:
+            del self._scenes[scene]
+            scene.on_release()
+
+    def release(self):
+        # Scenes still loading are initialized first, so on_release() sees the same state as for any other scene.
+        # A scene failing to load is reported, the others must still be released.
+        for scene in list(self._loading):
+            try:
+                self._initialize(scene)
+            except Exception as error:
+                print(f'Scene failed to load, nothing to release: {error!r}', file=stderr)
+        for scene in list(self._scenes):
+            self.release_scene(scene)
+        self.active = None
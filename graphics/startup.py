@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+
+# Called on every frame, resolved once the context is current instead of on their first call.
+HOT_FUNCTIONS = (
+    'glUseProgram',
+    'glBindBufferBase',
+    'glBindBufferRange',
+    'glBindImageTexture',
+    'glBindTextureUnit',
+    'glDispatchCompute',
+    'glMemoryBarrier',
+    'glBindFramebuffer',
+    'glBlitFramebuffer',
+    'glQueryCounter',
+    'glGetQueryObjectiv',
+    'glFinish'
+)
+
+
+def configure_opengl(debug: bool = None):
+    # Must run before the first import of OpenGL.GL, PyOpenGL reads these flags when it builds its wrappers.
+    # Production skips the glGetError() after every call, the error logging and the array size checks;
+    # debug keeps them and additionally checks for a current context on every call.
+    if 'OpenGL.GL' in sys.modules:
+        raise RuntimeError('OpenGL.GL was imported before configure_opengl()')
+    if debug is None:
+        debug = os.environ.get('GRAY_GL_DEBUG', '') not in ('', '0')
+    import OpenGL
+    OpenGL.ERROR_CHECKING = debug
+    OpenGL.ERROR_LOGGING = debug
+    OpenGL.CONTEXT_CHECKING = debug
+    OpenGL.ARRAY_SIZE_CHECKING = debug
+    return debug
+
+
+def resolve_functions(names=HOT_FUNCTIONS):
+    # PyOpenGL looks up entry points on their first call, which then lands in the first frame.
+    import OpenGL.GL
+    for name in names:
+        function = getattr(OpenGL.GL, name)
+        # Wrapped functions (e.g. with output arguments) keep the entry point in wrappedOperation.
+        function = getattr(function, 'wrappedOperation', function)
+        if not getattr(function, 'resolved', True):
+            function.load()
+
+
+class StartupTimer:
+    # Durations of consecutive startup phases, each mark() ends the phase started by the previous one.
+    def __init__(self, start: float = None):
+        self.start = start if start is not None else time.perf_counter()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, name: str):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def total(self):
+        return self.last - self.start
+
+    def report(self):
+        return {'phases': {name: seconds * 1000.0 for name, seconds in self.phases}, 'total_ms': self.total() * 1000.0}
@@ -0,0 +1,54 @@
+import OpenGL.GL
+from OpenGL.GL import *
+from graphics.formats import OUTPUT_FORMATS, STORAGE_POLICIES, BUCKET_SIZE
+
+# The sized internal format, the GLSL layout qualifier and the bytes per texel of each output format.
+IMAGE_FORMATS = {name: (getattr(OpenGL.GL, f'GL_{name.upper()}'), name, size) for name, size in OUTPUT_FORMATS.items()}
+
+
+class ResizableTexture:
+    # A texture with immutable storage (glTextureStorage2D), which may be larger than the size in use.
+    # Reallocation creates a new texture name, so users attaching it elsewhere must check the result of resize().
+    def __init__(self, target: int, format: str, policy: str = 'grow'):
+        if format not in IMAGE_FORMATS:
+            raise ValueError(f'Unknown image format: {format}')
+        if policy not in STORAGE_POLICIES:
+            raise ValueError(f'Unknown texture storage policy: {policy}')
+        self.target = target
+        self.format = format
+        self.internal_format = IMAGE_FORMATS[format][0]
+        self.policy = policy
+        self.texture = None
+        self.capacity = (0, 0)
+
+    def _capacity_for(self, width, height):
+        if self.policy == 'exact':
+            return width, height
+        if self.policy == 'bucket':
+            return -(-width // BUCKET_SIZE) * BUCKET_SIZE, -(-height // BUCKET_SIZE) * BUCKET_SIZE
+        if width <= self.capacity[0] and height <= self.capacity[1]:
+            return self.capacity
+        return max(width, self.capacity[0]), max(height, self.capacity[1])
+
+    def resize(self, width: int, height: int):
+        # Returns True if the texture was reallocated.
+        capacity = self._capacity_for(width, height)
+        if self.texture is not None and capacity == self.capacity:
+            return False
+        self.release()
+        texture = GLuint()
+        glCreateTextures(self.target, 1, texture)
+        glTextureStorage2D(texture, 1, self.internal_format, *capacity)
+        self.texture = texture.value
+        self.capacity = capacity
+        return True
+
+    def memory(self):
+        # Bytes allocated for the texture, which follows the capacity rather than the size in use.
+        return self.capacity[0] * self.capacity[1] * IMAGE_FORMATS[self.format][2]
+
+    def release(self):
+        if self.texture is not None:
+            glDeleteTextures(1, [self.texture])
+            self.texture = None
+            self.capacity = (0, 0)
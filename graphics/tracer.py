@@ -0,0 +1,226 @@
+import json
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+import numpy
+
+# Modules calling OpenGL through names imported with `from OpenGL.GL import *`, patched when they are loaded.
+TRACED_MODULES = (
+    'graphics.gl',
+    'graphics.main',
+    'graphics.capture',
+    'graphics.latency',
+    'graphics.profiler',
+    'graphics.program_cache',
+    'graphics.scene',
+    'graphics.texture',
+    'graphics.uniform',
+    'scene.sky',
+    'scene.sky_views'
+)
+# OpenGL entry points and the SDL functions talking to the driver, e.g. SDL_GL_SwapWindow.
+TRACED_NAMES = re.compile(r'^(gl[A-Z]\w*|SDL_GL_\w+)$')
+
+
+class GLTracer:
+    # Counts and times the OpenGL calls of the tracing thread by entry point, per frame, by replacing the names in the
+    # namespaces of the modules calling them. Nothing is replaced until install(), so a disabled tracer costs nothing.
+    # The time of a frame outside the calls is spent in Python: the scene, the draw loop and the PyOpenGL wrappers
+    # before they reach ctypes are all part of it, the wrappers after the call as well.
+    # With `allocations`, tracemalloc measures the memory allocated per frame, and every `snapshot_interval` frames
+    # a snapshot is compared to the previous one to find the lines allocating the most. Recording a call allocates
+    # nothing that outlives it: the counters are created by install() and the events go to preallocated arrays, so
+    # the measurement does not include the tracer's own bookkeeping.
+    def __init__(self, *, allocations: bool = False, snapshot_interval: int = 60, max_events: int = 1000000):
+        self.allocations = allocations
+        self.snapshot_interval = snapshot_interval
+        self.max_events = max_events
+        self.frame = -1
+        self.frames = []
+        # GL calls as the index of the entry point and the start and end times, the first event_count are valid.
+        self.event_names = numpy.zeros(max_events, dtype=numpy.int32)
+        self.event_times = numpy.zeros((max_events, 2), dtype=numpy.int64)
+        self.event_count = 0
+        self.allocation_sites = Counter()
+        self._patched = []
+        self._thread = None
+        self._recording = False
+        # Entry point names and their [calls, ns] of the current frame, by index.
+        self._names = []
+        self._entries = []
+        self._frame_start = None
+        self._memory_start = 0
+        self._snapshot = None
+        self._snapshot_frame = 0
+        self._origin = time.perf_counter_ns()
+
+    def install(self, modules=TRACED_MODULES):
+        # Patches the modules already imported, by name or module object. The calls are recorded on the thread that
+        # calls begin_frame(), the draw thread, other threads like the GL worker call through unrecorded.
+        for module in modules:
+            if isinstance(module, str):
+                module = sys.modules.get(module)
+                if module is None:
+                    continue
+            for name, function in list(vars(module).items()):
+                if TRACED_NAMES.match(name) and callable(function) and not hasattr(function, '__traced__'):
+                    setattr(module, name, self._wrap(name, function))
+                    self._patched.append((module, name, function))
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def uninstall(self):
+        for module, name, function in reversed(self._patched):
+            setattr(module, name, function)
+        self._patched = []
+        if self.allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _wrap(self, name, function):
+        clock = time.perf_counter_ns
+        get_ident = threading.get_ident
+        if name in self._names:
+            index = self._names.index(name)
+        else:
+            index = len(self._names)
+            self._names.append(name)
+            self._entries.append([0, 0])
+        entry = self._entries[index]
+        event_names = self.event_names
+        event_times = self.event_times
+
+        def traced(*args, **kwargs):
+            if not self._recording or get_ident() != self._thread:
+                return function(*args, **kwargs)
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end = clock()
+                entry[0] += 1
+                entry[1] += end - start
+                count = self.event_count
+                if count < self.max_events:
+                    event_names[count] = index
+                    event_times[count, 0] = start
+                    event_times[count, 1] = end
+                    self.event_count = count + 1
+
+        traced.__traced__ = function
+        traced.__name__ = name
+        return traced
+
+    def begin_frame(self):
+        self.frame += 1
+        self._thread = threading.get_ident()
+        for entry in self._entries:
+            entry[0] = 0
+            entry[1] = 0
+        self._recording = True
+        if self.allocations:
+            tracemalloc.reset_peak()
+            self._memory_start = tracemalloc.get_traced_memory()[0]
+        self._frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        end = time.perf_counter_ns()
+        self._recording = False
+        if self.allocations:
+            # Read before the record of the frame is built.
+            current, peak = tracemalloc.get_traced_memory()
+        calls = {name: entry for name, entry in zip(self._names, self._entries) if entry[0] > 0}
+        gl_ns = sum(entry[1] for entry in calls.values())
+        record = {
+            'frame': self.frame,
+            'start_ns': self._frame_start,
+            'wall_ns': end - self._frame_start,
+            'gl_ns': gl_ns,
+            'python_ns': end - self._frame_start - gl_ns,
+            'calls': {name: entry[0] for name, entry in calls.items()},
+            'call_ns': {name: entry[1] for name, entry in calls.items()}
+        }
+        if self.allocations:
+            record['allocated_bytes'] = current - self._memory_start
+            record['peak_bytes'] = peak - self._memory_start
+            if self.snapshot_interval and self.frame % self.snapshot_interval == 0:
+                self._compare_snapshots()
+        self.frames.append(record)
+
+    def _compare_snapshots(self):
+        # Allocation counts by line since the previous snapshot, divided by the frames in between.
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)
+        ])
+        if self._snapshot is not None:
+            frames = max(1, self.frame - self._snapshot_frame)
+            for statistic in snapshot.compare_to(self._snapshot, 'lineno'):
+                if statistic.count_diff > 0:
+                    frame = statistic.traceback[0]
+                    self.allocation_sites[f'{frame.filename}:{frame.lineno}'] += statistic.count_diff / frames
+        self._snapshot = snapshot
+        self._snapshot_frame = self.frame
+
+    def summary(self, top: int = 10):
+        if not self.frames:
+            return {}
+        count = len(self.frames)
+        calls = Counter()
+        call_ns = Counter()
+        for record in self.frames:
+            calls.update(record['calls'])
+            call_ns.update(record['call_ns'])
+        result = {
+            'frames': count,
+            'wall_ms': sum(record['wall_ns'] for record in self.frames) / count / 1e6,
+            'gl_ms': sum(record['gl_ns'] for record in self.frames) / count / 1e6,
+            'python_ms': sum(record['python_ns'] for record in self.frames) / count / 1e6,
+            'calls': sum(calls.values()) / count,
+            'entry_points': {
+                name: {'calls': calls[name] / count, 'ms': call_ns[name] / count / 1e6}
+                for name, _ in call_ns.most_common(top)
+            }
+        }
+        if self.allocations:
+            result['allocated_bytes'] = sum(record['allocated_bytes'] for record in self.frames) / count
+            result['peak_bytes'] = sum(record['peak_bytes'] for record in self.frames) / count
+            result['allocation_sites'] = dict(self.allocation_sites.most_common(top))
+        return result
+
+    def chrome_trace(self):
+        # Trace Event Format, loads in chrome://tracing and Perfetto: the frames and their GL calls as complete
+        # events on the draw thread, the time split and the allocations as counters.
+        def microseconds(ns):
+            return (ns - self._origin) / 1000.0
+
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': 'DrawThread'}}
+        ]
+        for record in self.frames:
+            start = microseconds(record['start_ns'])
+            events.append({'name': 'frame', 'cat': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': start, 'dur': record['wall_ns'] / 1000.0, 'args': {'frame': record['frame'], 'calls': sum(record['calls'].values())}})
+            events.append({'name': 'time', 'ph': 'C', 'pid': 1, 'ts': start, 'args': {'gl_ms': record['gl_ns'] / 1e6, 'python_ms': record['python_ns'] / 1e6}})
+            if 'allocated_bytes' in record:
+                events.append({'name': 'allocations', 'ph': 'C', 'pid': 1, 'ts': start, 'args': {'allocated_bytes': record['allocated_bytes'], 'peak_bytes': record['peak_bytes']}})
+        for index, (start, end) in zip(self.event_names[:self.event_count].tolist(), self.event_times[:self.event_count].tolist()):
+            events.append({'name': self._names[index], 'cat': 'gl', 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': microseconds(start), 'dur': (end - start) / 1000.0})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, filename: str):
+        with open(filename, 'w') as file:
+            json.dump(self.chrome_trace(), file)
+
+
+def print_summary(summary, file):
+    if not summary:
+        return
+    print(f'{summary["frames"]} frames traced, per frame: {summary["wall_ms"]:.3f} ms, {summary["gl_ms"]:.3f} ms in {summary["calls"]:.1f} GL calls, {summary["python_ms"]:.3f} ms in Python', file=file)
+    for name, entry in summary['entry_points'].items():
+        print(f'  {name:<32} {entry["calls"]:8.2f} calls {entry["ms"]:8.3f} ms', file=file)
+    if 'allocated_bytes' in summary:
+        print(f'  allocated {summary["allocated_bytes"]:.0f} bytes per frame, peak {summary["peak_bytes"]:.0f} bytes', file=file)
+        for site, count in summary['allocation_sites'].items():
+            print(f'  {count:8.2f} allocations per frame at {site}', file=file)
@@ -0,0 +1,55 @@
+import ctypes
+import numpy
+from OpenGL.GL import *
+
+
+class PersistentUniformBuffer:
+    # A uniform buffer mapped once for the lifetime of the buffer. Each write goes to the next of `count` regions,
+    # fenced after the commands reading it, so the CPU never overwrites a region the GPU may still read for a frame
+    # in flight. The wait only blocks when the driver queues `count` or more frames.
+    def __init__(self, size: int, count: int = 3):
+        alignment = int(glGetIntegerv(GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT))
+        self.size = size
+        self.count = count
+        self.stride = (size + alignment - 1) // alignment * alignment
+        self.index = 0
+        self.fences = [None] * count
+        self.buffer = GLuint()
+        glCreateBuffers(1, self.buffer)
+        flags = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+        glNamedBufferStorage(self.buffer, self.stride * count, None, flags)
+        pointer = glMapNamedBufferRange(self.buffer, 0, self.stride * count, flags)
+        self.memory = numpy.ctypeslib.as_array((ctypes.c_ubyte * (self.stride * count)).from_address(pointer))
+
+    def write(self, data: numpy.ndarray):
+        self.index = (self.index + 1) % self.count
+        self._wait(self.index)
+        offset = self.index * self.stride
+        self.memory[offset:offset + self.size] = data.view(numpy.uint8)
+
+    def bind(self, binding: int):
+        glBindBufferRange(GL_UNIFORM_BUFFER, binding, self.buffer, self.index * self.stride, self.size)
+
+    def fence(self):
+        # Called after the commands reading the current region, a later frame using it moves the fence.
+        if self.fences[self.index] is not None:
+            glDeleteSync(self.fences[self.index])
+        self.fences[self.index] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+    def _wait(self, index):
+        fence = self.fences[index]
+        if fence is None:
+            return
+        glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, GL_TIMEOUT_IGNORED)
+        glDeleteSync(fence)
+        self.fences[index] = None
+
+    def release(self):
+        for fence in self.fences:
+            if fence is not None:
+                glDeleteSync(fence)
+        self.fences = [None] * self.count
+        self.memory = None
+        glUnmapNamedBuffer(self.buffer)
+        glDeleteBuffers(1, [self.buffer.value])
+        self.buffer = None
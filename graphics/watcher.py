@@ -0,0 +1,134 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+_EVENT = struct.Struct('iIII')
+
+
+def _load_inotify():
+    # Returns libc if it provides inotify, None on other platforms.
+    name = ctypes.util.find_library('c')
+    if name is None:
+        return None
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FileWatcher:
+    # Calls on_change(paths) on a background thread when watched files change. On Linux, inotify watches the
+    # directories of the files, so a file replaced by a rename, as many editors save, is noticed as well.
+    # Elsewhere, the modification times are polled every `interval` seconds. Changes arriving within `settle`
+    # seconds of each other, e.g. a truncate followed by a write, are reported together.
+    def __init__(self, on_change, *, interval: float = 0.5, settle: float = 0.05, use_inotify: bool = True):
+        self.on_change = on_change
+        self.interval = interval
+        self.settle = settle
+        self._files = {}
+        self._directories = {}
+        self._lock = threading.Lock()
+        self._alive = True
+        self._libc = _load_inotify() if use_inotify else None
+        self._fd = -1
+        if self._libc is not None:
+            self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if self._fd < 0:
+                self._libc = None
+        self._thread = threading.Thread(target=self._run_inotify if self._libc is not None else self._run_polling, name='FileWatcher', daemon=True)
+        self._thread.start()
+
+    @property
+    def uses_inotify(self):
+        return self._libc is not None
+
+    def watch(self, paths):
+        # Safe to call from any thread, files already watched are ignored.
+        with self._lock:
+            for path in paths:
+                path = os.path.abspath(path)
+                if path in self._files:
+                    continue
+                self._files[path] = self._stat(path)
+                directory = os.path.dirname(path)
+                if self._libc is not None and directory not in self._directories.values():
+                    mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+                    descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+                    if descriptor < 0:
+                        error = ctypes.get_errno()
+                        raise OSError(error, os.strerror(error), directory)
+                    self._directories[descriptor] = directory
+
+    @staticmethod
+    def _stat(path):
+        try:
+            result = os.stat(path)
+        except OSError:
+            return None
+        return result.st_mtime_ns, result.st_size
+
+    def _read_events(self):
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                descriptor, mask, cookie, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                with self._lock:
+                    directory = self._directories.get(descriptor)
+                    if directory is not None:
+                        path = os.path.join(directory, os.fsdecode(name))
+                        if path in self._files:
+                            changed.add(path)
+
+    def _run_inotify(self):
+        while self._alive:
+            # The timeout only bounds how long close() waits for the thread.
+            readable, _, _ = select.select([self._fd], [], [], self.interval)
+            if not readable:
+                continue
+            changed = self._read_events()
+            while self._alive and select.select([self._fd], [], [], self.settle)[0]:
+                changed |= self._read_events()
+            if changed and self._alive:
+                self.on_change(changed)
+
+    def _run_polling(self):
+        while self._alive:
+            time.sleep(self.interval)
+            changed = set()
+            with self._lock:
+                for path, previous in self._files.items():
+                    current = self._stat(path)
+                    if current != previous:
+                        self._files[path] = current
+                        changed.add(path)
+            if changed and self._alive:
+                self.on_change(changed)
+
+    def close(self):
+        self._alive = False
+        self._thread.join()
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
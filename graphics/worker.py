@@ -0,0 +1,78 @@
+import queue
+import threading
+from concurrent.futures import Future
+from sdl2 import *
+from OpenGL.GL import glFinish
+from ui.error import UIError
+from graphics.gl import gl_parallel_shader_compile
+
+
+class GLWorker:
+    # Runs functions on a thread with its own OpenGL context, shared with the draw context. Programs, buffers and
+    # textures it creates can be used by the draw thread, framebuffers and vertex arrays cannot.
+    def __init__(self, window, gl_context):
+        self.window = window
+        self.gl_context = gl_context
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='GLWorker', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def create(cls):
+        # Must be called on the main thread while the context to share with is current.
+        # EGL does not allow a surface to be current in two threads, so the worker gets a hidden window of its own.
+        window = SDL_CreateWindow(b'GLWorker', SDL_WINDOWPOS_UNDEFINED, SDL_WINDOWPOS_UNDEFINED, 1, 1, SDL_WINDOW_HIDDEN | SDL_WINDOW_OPENGL)
+        if window is None:
+            raise UIError
+        SDL_GL_SetAttribute(SDL_GL_SHARE_WITH_CURRENT_CONTEXT, 1)
+        gl_context = SDL_GL_CreateContext(window)
+        SDL_GL_SetAttribute(SDL_GL_SHARE_WITH_CURRENT_CONTEXT, 0)
+        if gl_context is None:
+            SDL_DestroyWindow(window)
+            raise UIError
+        SDL_GL_MakeCurrent(None, None)
+        return cls(window, gl_context)
+
+    def submit(self, function, *args):
+        future = Future()
+        self._queue.put((function, args, future))
+        return future
+
+    def _run(self):
+        if SDL_GL_MakeCurrent(self.window, self.gl_context) < 0:
+            self._fail(UIError())
+            return
+        gl_parallel_shader_compile()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                function, args, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = function(*args)
+                    # Objects are only guaranteed complete for other contexts once the commands creating them finished.
+                    glFinish()
+                except BaseException as error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+        finally:
+            SDL_GL_MakeCurrent(None, None)
+
+    def _fail(self, error):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            item[2].set_exception(error)
+
+    def release(self):
+        self._queue.put(None)
+        self._thread.join()
+        SDL_GL_DeleteContext(self.gl_context)
+        SDL_DestroyWindow(self.window)
+        self.gl_context = None
+        self.window = None
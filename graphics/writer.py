@@ -0,0 +1,79 @@
+import os
+import queue
+import threading
+import numpy
+from graphics.image import write_ppm, write_png
+
+CAPTURE_FORMATS = ('ppm', 'png', 'raw')
+# 'drop' discards a frame when the ring or the writer queue is full, so capturing never slows the draw thread;
+# 'block' waits instead, so no frame is lost.
+BACKPRESSURE_POLICIES = ('drop', 'block')
+
+
+class FrameWriter:
+    # Writes captured frames on a background thread. Images go to one file per frame, named by formatting
+    # `path` with the frame index, e.g. 'frames/frame-{index:05d}.png'; raw frames are appended to the single file
+    # `path` as bottom-up RGBA rows, e.g. for `ffmpeg -f rawvideo -pix_fmt rgba -s WxH -i path -vf vflip`.
+    def __init__(self, path: str, format: str = None, *, queue_size: int = 8, policy: str = 'drop'):
+        if format is None:
+            format = os.path.splitext(path)[1][1:].lower()
+        if format not in CAPTURE_FORMATS:
+            raise ValueError(f'Unknown capture format: {format}')
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f'Unknown backpressure policy: {policy}')
+        self.path = path
+        self.format = format
+        self.policy = policy
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+        self._queue = queue.Queue(queue_size)
+        self._file = open(path, 'wb') if format == 'raw' else None
+        self._thread = threading.Thread(target=self._run, name='FrameWriter', daemon=True)
+        self._thread.start()
+
+    def submit(self, index: int, pixels: numpy.ndarray):
+        # Pixels are (height, width, 4) unsigned bytes, bottom row first, as read from OpenGL, or (height, width, 3).
+        # Returns False if the frame was dropped.
+        try:
+            self._queue.put((index, pixels), block=self.policy == 'block')
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _write(self, index, pixels):
+        if self.format == 'raw':
+            if pixels.shape[2] == 3:
+                # Frames rendered on the CPU have no alpha, the raw stream stays RGBA for every renderer.
+                rgba = numpy.full(pixels.shape[:2] + (4,), 255, dtype=numpy.uint8)
+                rgba[:, :, :3] = pixels
+                pixels = rgba
+            self._file.write(numpy.ascontiguousarray(pixels).tobytes())
+        elif self.format == 'png':
+            write_png(self.path.format(index=index), pixels[::-1, :, :3])
+        else:
+            write_ppm(self.path.format(index=index), pixels[::-1])
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self._write(*item)
+                self.written += 1
+            except Exception as error:
+                # Reported by close(), the draw thread must not fail because the disk is full.
+                self.error = error
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.error is not None:
+            raise self.error
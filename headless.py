@@ -0,0 +1,380 @@
+import time
+# Taken before the other imports, so the startup report includes them.
+START_TIME = time.perf_counter()
+import argparse
+import json
+import math
+import os
+from sys import exit, stderr
+import __main__
+import numpy
+from sdl2 import *
+from ui.error import UIError
+from ui.context import set_gl_attributes
+from graphics.formats import OUTPUT_FORMATS
+from graphics.image import to_rgb8
+from graphics.startup import StartupTimer, configure_opengl, resolve_functions
+
+
+def create_context(width: int, height: int):
+    if SDL_Init(SDL_INIT_VIDEO) < 0:
+        raise UIError
+
+    set_gl_attributes()
+
+    # The window is never shown, it only exists to own the OpenGL context.
+    window = SDL_CreateWindow(b'Gray', SDL_WINDOWPOS_UNDEFINED, SDL_WINDOWPOS_UNDEFINED, width, height, SDL_WINDOW_HIDDEN | SDL_WINDOW_OPENGL)
+    if window is None:
+        raise UIError
+
+    gl_context = SDL_GL_CreateContext(window)
+    if gl_context is None:
+        SDL_DestroyWindow(window)
+        raise UIError
+    if SDL_GL_MakeCurrent(window, gl_context) < 0:
+        raise UIError
+    # Never wait for a display refresh, frames are produced as fast as the driver allows.
+    SDL_GL_SetSwapInterval(0)
+    return window, gl_context
+
+
+def release_context(window, gl_context):
+    SDL_GL_MakeCurrent(None, None)
+    SDL_GL_DeleteContext(gl_context)
+    SDL_DestroyWindow(window)
+    SDL_Quit()
+
+
+class OffscreenTarget:
+    # The default framebuffer of a hidden window has undefined content (pixel ownership test),
+    # so scenes draw into an RGBA8 renderbuffer bound as the draw framebuffer instead.
+    def __init__(self, width: int, height: int):
+        from OpenGL.GL import glGenFramebuffers, glGenRenderbuffers, glBindRenderbuffer, glRenderbufferStorage, glBindFramebuffer, glFramebufferRenderbuffer, GL_RENDERBUFFER, GL_RGBA8, GL_DRAW_FRAMEBUFFER, GL_COLOR_ATTACHMENT0
+        self.width = width
+        self.height = height
+        self.renderbuffer = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.renderbuffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.framebuffer)
+        glFramebufferRenderbuffer(GL_DRAW_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.renderbuffer)
+
+    def bind(self):
+        from OpenGL.GL import glBindFramebuffer, GL_DRAW_FRAMEBUFFER
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.framebuffer)
+
+    def read(self):
+        from OpenGL.GL import glBindFramebuffer, glPixelStorei, glReadPixels, GL_READ_FRAMEBUFFER, GL_PACK_ALIGNMENT, GL_RGB, GL_UNSIGNED_BYTE
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.framebuffer)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
+        # OpenGL rows go bottom-up, images go top-down.
+        return numpy.frombuffer(data, dtype=numpy.uint8).reshape(self.height, self.width, 3)[::-1]
+
+    def release(self):
+        from OpenGL.GL import glBindFramebuffer, glDeleteFramebuffers, glDeleteRenderbuffers, GL_DRAW_FRAMEBUFFER
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+        glDeleteFramebuffers(1, [self.framebuffer])
+        glDeleteRenderbuffers(1, [self.renderbuffer])
+
+
+def run_scene(scene, target: OffscreenTarget, frame_count: int, *, before_paint=None, after_paint=None, finish=True, profiler=None, tracer=None, startup: StartupTimer = None):
+    # Drives the scene the same way gl_main() does, but without any event loop.
+    # Returns the duration of every frame in nanoseconds.
+    from OpenGL.GL import glGenFramebuffers, glDeleteFramebuffers, glFinish
+    __main__.gl_framebuffer = glGenFramebuffers(1)
+    frame_times = []
+    if profiler is not None:
+        scene.profiler = profiler
+    try:
+        scene.on_initialize()
+        scene.on_play()
+        scene.on_resize(target.width, target.height)
+        target.bind()
+        if startup is not None:
+            startup.mark('initialize')
+        for index in range(frame_count):
+            start = time.perf_counter_ns()
+            if before_paint is not None:
+                before_paint(index)
+            if tracer is not None:
+                tracer.begin_frame()
+            scene.profiler.begin_frame()
+            with scene.profiler.phase('paint'):
+                scene.on_paint()
+            scene.profiler.end_frame()
+            if tracer is not None:
+                # Before glFinish(), the tracer measures the CPU side of the frame.
+                tracer.end_frame()
+            if finish:
+                glFinish()
+            frame_times.append(time.perf_counter_ns() - start)
+            if startup is not None and index == 0:
+                if not finish:
+                    glFinish()
+                startup.mark('first_frame')
+            if after_paint is not None:
+                after_paint(index)
+        scene.on_stop()
+        scene.on_release()
+    finally:
+        glDeleteFramebuffers(1, [__main__.gl_framebuffer])
+        __main__.gl_framebuffer = None
+    return frame_times
+
+
+def run_views(frame_count: int, *, before_paint=None, after_paint=None, finish=True, startup: StartupTimer = None):
+    # Like run_scene(), before_paint() is expected to render the views.
+    from OpenGL.GL import glFinish
+    frame_times = []
+    if startup is not None:
+        startup.mark('initialize')
+    for index in range(frame_count):
+        start = time.perf_counter_ns()
+        if before_paint is not None:
+            before_paint(index)
+        if finish:
+            glFinish()
+        frame_times.append(time.perf_counter_ns() - start)
+        if startup is not None and index == 0:
+            if not finish:
+                glFinish()
+            startup.mark('first_frame')
+        if after_paint is not None:
+            after_paint(index)
+    return frame_times
+
+
+def run_cpu(camera, frame_count: int, *, before_paint=None, after_paint=None):
+    # CPU fallback for nodes without a usable GPU, renders with the NumPy implementation of the sky model.
+    from scene.sky_model import render_sky
+    frame = None
+    frame_times = []
+    for index in range(frame_count):
+        start = time.perf_counter_ns()
+        if before_paint is not None:
+            before_paint(index)
+        frame = render_sky(camera, frame)
+        frame_times.append(time.perf_counter_ns() - start)
+        if after_paint is not None:
+            after_paint(index, frame)
+    return frame_times
+
+
+def frame_time_summary(frame_times):
+    if not frame_times:
+        # Nothing was rendered, e.g. --frames 0, there are no percentiles to report.
+        return {'frames': 0, 'total_ms': 0.0, 'fps': 0.0}
+    times = numpy.array(frame_times, dtype=numpy.float64) / 1e6
+    total = float(numpy.sum(times))
+    return {
+        'frames': len(frame_times),
+        'total_ms': total,
+        'fps': len(frame_times) / (total / 1000.0) if total > 0 else math.inf,
+        'mean_ms': float(numpy.mean(times)),
+        'p50_ms': float(numpy.percentile(times, 50)),
+        'p95_ms': float(numpy.percentile(times, 95)),
+        'p99_ms': float(numpy.percentile(times, 99)),
+        'max_ms': float(numpy.max(times))
+    }
+
+
+def configure_video_driver(driver):
+    # Without a display server, SDL's offscreen driver creates a surfaceless EGL context;
+    # PyOpenGL must then resolve its entry points through EGL as well.
+    if driver is None and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+        driver = 'offscreen'
+    if driver is not None:
+        os.environ['SDL_VIDEODRIVER'] = driver
+        SDL_SetHint(SDL_HINT_VIDEODRIVER, driver.encode('utf-8'))
+        if driver == 'offscreen':
+            os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+
+
+def configure_mesa_override():
+    # Mesa's llvmpipe exposes OpenGL 4.5, but implements everything the scenes use from 4.6.
+    os.environ.setdefault('MESA_GL_VERSION_OVERRIDE', '4.6')
+    os.environ.setdefault('MESA_GLSL_VERSION_OVERRIDE', '460')
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Render a scene without a display.')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--backend', choices=['compute', 'fragment'], default='compute', help='compute shader and blit, or a fullscreen triangle drawn straight into the framebuffer')
+    parser.add_argument('--local-size', type=int, nargs=2, default=(16, 16), help='compute shader tile size')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='rgba8', help='format of the texture the scene renders into')
+    parser.add_argument('--dynamic-resolution', type=float, default=None, metavar='TARGET_MS', help='scale the render resolution so the GPU frame time meets this target')
+    parser.add_argument('--minimum-scale', type=float, default=0.5, help='lowest render scale of the dynamic resolution')
+    parser.add_argument('--views', type=lambda text: tuple(int(value) for value in text.split('x')), default=None, metavar='COLUMNSxROWS', help='render a grid of views in one dispatch, each frame is the whole grid')
+    parser.add_argument('--sky-lut', type=int, default=None, metavar='SIZE', help='bake the sky into a cube map with SIZE x SIZE faces')
+    parser.add_argument('--yaw-step', type=float, default=0.0, help='camera yaw rotation per frame, in degrees')
+    parser.add_argument('--output', default=None, help='directory to write the frames to')
+    parser.add_argument('--image-format', choices=['ppm', 'png', 'raw'], default='ppm', help='one image per frame, or all frames in a single raw file')
+    parser.add_argument('--capture-policy', choices=['drop', 'block'], default='block', help='whether frames are dropped or rendering waits when the writer falls behind')
+    parser.add_argument('--capture-queue', type=int, default=8, help='frames queued for the writer thread')
+    parser.add_argument('--timings', default=None, help='file to write the frame timings as JSON')
+    parser.add_argument('--profile', default=None, help='file to write the per-phase CPU and GPU timings as CSV or JSON')
+    parser.add_argument('--renderer', choices=['gl', 'cpu'], default='gl', help='render with OpenGL or with the NumPy reference implementation')
+    parser.add_argument('--video-driver', default=None, help='SDL video driver, "offscreen" when no display is available')
+    parser.add_argument('--mesa-override', action='store_true', help='report OpenGL 4.6 on Mesa drivers limited to 4.5, like llvmpipe')
+    parser.add_argument('--program-cache', default=None, help='directory of the compiled program cache')
+    parser.add_argument('--no-program-cache', action='store_true', help='always compile the shaders from source')
+    parser.add_argument('--gl-debug', action='store_true', default=None, help='keep PyOpenGL error checking and logging, also enabled by GRAY_GL_DEBUG=1')
+    parser.add_argument('--trace', default=None, metavar='FILE', help='count and time the GL calls of every frame, written to FILE as a Chrome trace')
+    parser.add_argument('--trace-allocations', action='store_true', help='also measure the memory allocated per frame with tracemalloc')
+    parser.add_argument('--startup', default=None, help='file to write the time to first frame, by startup phase, as JSON')
+    parser.add_argument('--no-finish', action='store_true', help='do not wait for each frame to complete on the GPU')
+    arguments = parser.parse_args(argv)
+    if arguments.views is not None:
+        # The grid of views is rendered by SkyViews, without the options of SkyScene and the per-frame instrumentation.
+        ignored = {
+            '--backend': arguments.backend != 'compute',
+            '--dynamic-resolution': arguments.dynamic_resolution is not None,
+            '--sky-lut': arguments.sky_lut is not None,
+            '--profile': arguments.profile is not None,
+            '--trace': arguments.trace is not None or arguments.trace_allocations
+        }
+        options = [option for option, used in ignored.items() if used]
+        if options:
+            parser.error(f'--views cannot be combined with {", ".join(options)}')
+    return arguments
+
+
+def main(argv=None):
+    startup = StartupTimer(START_TIME)
+    startup.mark('import')
+    arguments = parse_arguments(argv)
+    configure_opengl(arguments.gl_debug)
+    writer = None
+    capture = None
+    if arguments.output is not None:
+        from graphics.writer import FrameWriter
+        os.makedirs(arguments.output, exist_ok=True)
+        if arguments.image_format == 'raw':
+            path = os.path.join(arguments.output, 'frames.raw')
+        else:
+            path = os.path.join(arguments.output, 'frame-{index:05d}.' + arguments.image_format)
+        writer = FrameWriter(path, arguments.image_format, queue_size=arguments.capture_queue, policy=arguments.capture_policy)
+
+    if arguments.renderer == 'cpu':
+        from graphics.camera import MouseCamera
+        from scene.sky_model import SKY_FIELD_OF_VIEW
+        camera = MouseCamera(field_of_view=SKY_FIELD_OF_VIEW, width=arguments.width, height=arguments.height)
+
+        def before_paint(index):
+            if arguments.yaw_step != 0.0:
+                camera.rotate(math.radians(arguments.yaw_step), 0.0)
+
+        def after_paint(index, frame):
+            if writer is not None:
+                writer.submit(index, to_rgb8(frame, flip=False))
+
+        frame_times = run_cpu(camera, arguments.frames, before_paint=before_paint, after_paint=after_paint)
+    else:
+        configure_video_driver(arguments.video_driver)
+        if arguments.mesa_override:
+            configure_mesa_override()
+        startup.mark('configure')
+
+        window, gl_context = create_context(arguments.width, arguments.height)
+        startup.mark('context')
+        try:
+            from scene.sky import SkyScene
+            from graphics.program_cache import ProgramCache
+            from graphics.profiler import FrameProfiler
+            from graphics.resolution import DynamicResolution
+            from graphics.capture import FrameCapture
+            from OpenGL.GL import glFinish
+            resolve_functions()
+            startup.mark('gl_import')
+            program_cache = None if arguments.no_program_cache else ProgramCache(arguments.program_cache)
+            if arguments.views is not None:
+                from scene.sky_views import SkyViews, tile_views
+                columns, rows = arguments.views
+                views = SkyViews(arguments.width // columns, arguments.height // rows, columns * rows, local_size=arguments.local_size, output_format=arguments.output_format, program_cache=program_cache)
+                startup.mark('scene')
+                # Columns turn around the horizon, rows go from looking up in the first row to looking down in the last;
+                # a negative pitch looks up.
+                yaw = numpy.tile(numpy.linspace(0.0, 2.0 * math.pi, columns, endpoint=False), rows)
+                pitch = numpy.repeat(numpy.linspace(-math.pi / 3, math.pi / 3, rows) if rows > 1 else numpy.zeros(1), columns)
+
+                def before_paint(index):
+                    views.render(yaw + math.radians(arguments.yaw_step) * (index + 1), pitch)
+
+                def after_paint(index):
+                    if writer is not None:
+                        writer.submit(index, tile_views(views.read(), columns))
+
+                frame_times = run_views(arguments.frames, before_paint=before_paint, after_paint=after_paint, finish=not arguments.no_finish, startup=startup)
+                views.release()
+            else:
+                dynamic_resolution = None
+                if arguments.dynamic_resolution is not None:
+                    dynamic_resolution = DynamicResolution(arguments.dynamic_resolution, minimum_scale=arguments.minimum_scale)
+                scene = SkyScene(backend=arguments.backend, local_size=arguments.local_size, output_format=arguments.output_format, dynamic_resolution=dynamic_resolution, sky_lut=arguments.sky_lut, program_cache=program_cache)
+                target = OffscreenTarget(arguments.width, arguments.height)
+                capture = FrameCapture(writer) if writer is not None else None
+                startup.mark('scene')
+
+                def before_paint(index):
+                    if arguments.yaw_step != 0.0:
+                        scene.camera.rotate(math.radians(arguments.yaw_step), 0.0)
+
+                def after_paint(index):
+                    if capture is not None:
+                        capture.capture(target.framebuffer, target.width, target.height)
+
+                profiler = FrameProfiler() if arguments.profile is not None else None
+                tracer = None
+                if arguments.trace is not None:
+                    from graphics.tracer import GLTracer, print_summary
+                    tracer = GLTracer(allocations=arguments.trace_allocations)
+                    tracer.install()
+                try:
+                    frame_times = run_scene(scene, target, arguments.frames, before_paint=before_paint, after_paint=after_paint, finish=not arguments.no_finish, profiler=profiler, tracer=tracer, startup=startup)
+                finally:
+                    # The patched modules are restored even when rendering failed.
+                    if tracer is not None:
+                        tracer.uninstall()
+                if tracer is not None:
+                    tracer.dump(arguments.trace)
+                    print_summary(tracer.summary(), stderr)
+                if profiler is not None:
+                    # Collect the queries still in flight before writing the results.
+                    glFinish()
+                    profiler.collect()
+                    profiler.dump(arguments.profile)
+                    profiler.release()
+                if capture is not None:
+                    capture.release()
+                target.release()
+        finally:
+            release_context(window, gl_context)
+
+    summary = frame_time_summary(frame_times)
+    summary['width'] = arguments.width
+    summary['height'] = arguments.height
+    if writer is not None:
+        writer.close()
+        summary['frames_written'] = writer.written
+        summary['frames_dropped'] = writer.dropped + (capture.dropped if capture is not None else 0)
+    if summary['frames'] > 0:
+        print(f'{summary["frames"]} frames in {summary["total_ms"]:.1f} ms, {summary["fps"]:.1f} FPS, p50 {summary["p50_ms"]:.3f} ms, p99 {summary["p99_ms"]:.3f} ms', file=stderr)
+    else:
+        print('0 frames rendered', file=stderr)
+    if arguments.startup is not None and arguments.renderer == 'gl':
+        with open(arguments.startup, 'w') as file:
+            json.dump(startup.report(), file, indent=2)
+    if arguments.timings is not None:
+        summary['frame_times_ms'] = [value / 1e6 for value in frame_times]
+        with open(arguments.timings, 'w') as file:
+            json.dump(summary, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -1,53 +1,104 @@
+import argparse
 import threading
+import time
 import ctypes
 import math
+import os
+import sys
 from sys import exit, stderr
 from traceback import print_exc
 from sdl2 import *
 from ui.error import UIError
 from ui.display import get_display_under_cursor, get_display_bounds
-from OpenGL.GL import *
-from scene.sky import SkyScene
-from graphics.scene import Scene
+from ui.context import set_gl_attributes
+from graphics.startup import configure_opengl
+from graphics.formats import OUTPUT_FORMATS, STORAGE_POLICIES
+# Modules importing OpenGL.GL are imported in main(), after configure_opengl().
 
 window = None
 window_id = 0
 gl_context = None
+# Compiles the programs of preloaded scenes on a context shared with gl_context.
+gl_worker = None
+# Watches the shader files of the scenes when hot reloading.
+gl_watcher = None
 gl_thread = None
 gl_loop_alive = True
 gl_loop_running = threading.Event()
 gl_need_resize = False
+# Window resizes are applied once the size has been stable for this many seconds, e.g. at the end of a drag.
+gl_resize_debounce = 0.05
+_gl_resize_time = 0.0
+gl_need_redraw = False
+gl_continuous = False
 gl_framebuffer = None
-_gl_scene_set = set()
+gl_profiler = None
+gl_profile_filename = None
+gl_profile_dump = False
+# Records the GL calls of the draw thread per frame when tracing, see graphics/tracer.py.
+gl_tracer = None
+gl_trace_filename = None
+# Receives the frames read back by the draw thread when recording.
+gl_frame_writer = None
+# Frames dropped by the draw thread because all read back buffers were still in flight, set when it exits.
+gl_capture_dropped = 0
+# Input-to-photon latency, see graphics/latency.py.
+gl_latency = None
+# Apply the mouse motion inside on_paint(), right before the camera is read, instead of before the frame.
+gl_late_latch = False
+gl_max_frames_in_flight = None
+_gl_scene_manager = None
 _gl_scene_active = None
 _gl_scene_next = None
 _gl_scene_lock = threading.RLock()
 _gl_scene_active_event = threading.Event()
+# Set whenever something outside the scene requires a new frame, the draw thread waits on it in on-demand mode.
+_gl_redraw_event = threading.Event()
+# Mouse motion is accumulated by the event loop and applied to the camera once per frame by the draw thread.
+_mouse_lock = threading.Lock()
+_mouse_delta_x = 0.0
+_mouse_delta_y = 0.0
+# Timestamp of the oldest input applied to the frame being drawn, set by _apply_mouse_motion() on the draw thread.
+_frame_input_time = None
+# Size of the display under the window, invalidated when displays change or the window moves.
+_rotation_size = None
 
 
 def gl_main():
-    global _gl_scene_next, _gl_scene_active, gl_framebuffer
+    global _gl_scene_next, _gl_scene_active, gl_need_resize, gl_need_redraw, gl_profile_dump, gl_capture_dropped, _frame_input_time
     from graphics.main import on_initialize, on_paint, on_release, on_resize
+    from graphics.capture import FrameCapture
+    from graphics.latency import FrameLimiter
+    capture = None
+    limiter = None
     try:
+        if gl_tracer is not None:
+            from graphics.tracer import TRACED_MODULES
+            # Installed once the modules of the draw thread are imported, this module traces SDL_GL_SwapWindow().
+            gl_tracer.install([*TRACED_MODULES, sys.modules[__name__]])
         if SDL_GL_MakeCurrent(window, gl_context) < 0:
             raise UIError
         if SDL_GL_SetSwapInterval(-1) < 0:
             print('Request for variable refresh rate failed, fallback to VSync', file=stderr)
             if SDL_GL_SetSwapInterval(1) < 0:
                 raise UIError
-            
-        gl_framebuffer = glGenFramebuffers(1)
-        
-        glHint(GL_LINE_SMOOTH_HINT, GL_NICEST)
-        glHint(GL_POLYGON_SMOOTH_HINT, GL_NICEST)
-        glHint(GL_TEXTURE_COMPRESSION_HINT, GL_NICEST)
-        glHint(GL_FRAGMENT_SHADER_DERIVATIVE_HINT, GL_NICEST)
+
+        on_initialize()
+        if gl_frame_writer is not None:
+            capture = FrameCapture(gl_frame_writer)
+        if gl_max_frames_in_flight is not None or gl_latency is not None:
+            limiter = FrameLimiter(gl_max_frames_in_flight, gl_latency)
+        drawable_size = (0, 0)
 
         while gl_loop_alive:
             _gl_scene_active_event.wait()
             gl_loop_running.wait()
+            # Cleared before the checks below, so a request made after them wakes the wait at the end of the loop.
+            _gl_redraw_event.clear()
 
             call_on_play = False
+            resize_now = False
+            resize_wait = None
 
             with _gl_scene_lock:
                 if _gl_scene_next != _gl_scene_active:
@@ -56,29 +107,80 @@ def gl_main():
                         # Notify the current scene it is stopping;
                         _gl_scene_active.on_stop()
                     _gl_scene_active = _gl_scene_next
+                    if _gl_scene_active is not None:
+                        _gl_scene_active.profiler = gl_profiler
                     # Notify the new scene that it is playing;
                     # Calling on_play() must be called after on_initialize() if the scene is new.
                     call_on_play = True
-                    gl_need_resize = True
+                    resize_now = True
 
-            if _gl_scene_active is not None:
-                if _gl_scene_active not in _gl_scene_set:
-                    _gl_scene_active.on_initialize()
-                    _gl_scene_set.add(_gl_scene_active)
-                    gl_need_resize = True
+            _gl_scene_manager.update()
 
+            if _gl_scene_active is not None:
                 if call_on_play:
+                    # Initializes the scene, unless it was preloaded, and may release scenes over the GPU budget.
+                    _gl_scene_manager.activate(_gl_scene_active)
+                    # With late latching the motion is applied by on_paint(), right before the camera is read.
+                    _gl_scene_active.input_latch = (lambda scene=_gl_scene_active: _apply_mouse_motion(scene)) if gl_late_latch else None
                     _gl_scene_active.on_play()
 
-                if gl_need_resize:
+                # The motion is applied once the frame is about to be drawn, the scene is not dirty until then.
+                need_paint = gl_continuous or _has_mouse_motion()
+                if gl_need_redraw:
+                    gl_need_redraw = False
+                    need_paint = True
+
+                if gl_need_resize and not resize_now:
+                    resize_wait = _gl_resize_time + gl_resize_debounce - time.monotonic()
+                    if resize_wait <= 0.0:
+                        resize_now = True
+                        resize_wait = None
+
+                if resize_now:
+                    gl_need_resize = False
+                    need_paint = True
                     width = ctypes.c_int()
                     height = ctypes.c_int()
                     SDL_GL_GetDrawableSize(window, width, height)
-                    _gl_scene_active.on_resize(width.value, height.value)
-                
-                _gl_scene_active.on_paint()
-                
-                SDL_GL_SwapWindow(window)
+                    drawable_size = (width.value, height.value)
+                    _gl_scene_active.on_resize(*drawable_size)
+
+                if need_paint or call_on_play or _gl_scene_active.is_dirty():
+                    if limiter is not None:
+                        # Waits for the GPU before the input is sampled, so the frame reflects the latest input.
+                        with gl_profiler.phase('limit'):
+                            limiter.wait()
+                    if not gl_late_latch:
+                        _apply_mouse_motion(_gl_scene_active)
+                    if gl_tracer is not None:
+                        gl_tracer.begin_frame()
+                    gl_profiler.begin_frame()
+                    with gl_profiler.phase('paint'):
+                        _gl_scene_active.on_paint()
+                    if capture is not None:
+                        # Only starts the readback of the back buffer, the pixels reach the writer a few frames later.
+                        with gl_profiler.phase('capture'):
+                            capture.capture(0, *drawable_size)
+                    with gl_profiler.phase('swap'):
+                        SDL_GL_SwapWindow(window)
+                    if limiter is not None:
+                        input_time, _frame_input_time = _frame_input_time, None
+                        if input_time is not None:
+                            gl_latency.record('swap', input_time)
+                        limiter.submitted(input_time)
+                    gl_profiler.end_frame()
+                    if gl_tracer is not None:
+                        gl_tracer.end_frame()
+                    if gl_profile_dump:
+                        # Dumped on the draw thread, which is the only writer of the profiler.
+                        gl_profile_dump = False
+                        gl_profiler.dump(gl_profile_filename)
+                else:
+                    # Nothing changed since the last frame, block until a redraw is requested or a pending resize is due.
+                    if gl_worker is None and _gl_scene_manager.is_reloading():
+                        # Programs compiling on the draw thread's context are polled, nothing signals their completion.
+                        resize_wait = min(resize_wait, 0.01) if resize_wait is not None else 0.01
+                    _gl_redraw_event.wait(resize_wait)
             else:
                 # If no active scene, clear the event, so the thread is blocked.
                 _gl_scene_active_event.clear()
@@ -88,10 +190,21 @@ def gl_main():
 
         _gl_scene_next = None
 
-        for scene in _gl_scene_set:
-            scene.on_release()
-            
-        glDeleteFramebuffers(1, [gl_framebuffer])
+        _gl_scene_manager.release()
+
+        if gl_profile_filename is not None:
+            # Collect the queries still in flight, so the last frames have GPU times in the results written on exit.
+            from OpenGL.GL import glFinish
+            glFinish()
+            gl_profiler.collect()
+        gl_profiler.release()
+        if capture is not None:
+            gl_capture_dropped = capture.dropped
+            capture.release()
+        if limiter is not None:
+            limiter.release()
+
+        on_release()
 
     except:
         event = SDL_Event()
@@ -100,8 +213,84 @@ def gl_main():
         print_exc()
 
 
-def main():
-    global window, window_id, gl_context, gl_thread, gl_loop_alive, gl_loop_running, gl_need_resize
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Gray')
+    parser.add_argument('--continuous', action='store_true', help='repaint every frame, even when the scene did not change')
+    parser.add_argument('--backend', choices=['compute', 'fragment'], default='compute', help='render the sky with a compute shader and a blit, or a fullscreen triangle drawn straight into the back buffer')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='rgba8', help='format of the texture scenes render into')
+    parser.add_argument('--texture-storage', choices=STORAGE_POLICIES, default='grow', help='when render textures are reallocated on resize')
+    parser.add_argument('--resize-debounce', type=float, default=50.0, help='milliseconds the window size must be stable before the scene is resized')
+    parser.add_argument('--dynamic-resolution', type=float, default=None, metavar='TARGET_MS', help='scale the render resolution so the GPU frame time meets this target')
+    parser.add_argument('--minimum-scale', type=float, default=0.5, help='lowest render scale of the dynamic resolution')
+    parser.add_argument('--progressive', type=float, default=None, metavar='BUDGET_MS', help='render the frame in tiles over several frames, each within this GPU time budget')
+    parser.add_argument('--tile-size', type=int, default=128, help='pixels per side of the progressive tiles')
+    parser.add_argument('--preview-block', type=int, default=8, help='pixels per side of the blocks of the low resolution pass when progressive rendering restarts')
+    parser.add_argument('--alternate-backend', choices=['compute', 'fragment'], default=None, help='preload a second scene with this backend in the background, F2 switches between the scenes')
+    parser.add_argument('--sky-lut', type=int, default=None, metavar='SIZE', help='bake the sky into a cube map with SIZE x SIZE faces')
+    parser.add_argument('--gpu-budget', type=float, default=None, metavar='MB', help='release the least recently used inactive scenes when the scenes use more GPU memory')
+    parser.add_argument('--no-worker', action='store_true', help='preload scenes on the draw thread instead of a worker thread with a shared context')
+    parser.add_argument('--hot-reload', action='store_true', help='watch the shader files and recompile the programs of the scenes when they change')
+    parser.add_argument('--gl-debug', action='store_true', default=None, help='keep PyOpenGL error checking and logging, also enabled by GRAY_GL_DEBUG=1')
+    parser.add_argument('--record', default=None, metavar='PATH', help='record the frames, e.g. frames/frame-{index:05d}.png, or a single frames.raw file of RGBA frames')
+    parser.add_argument('--record-policy', choices=['drop', 'block'], default='drop', help='drop frames, or wait for the writer, when the recording falls behind')
+    parser.add_argument('--record-queue', type=int, default=8, help='frames queued for the writer thread')
+    parser.add_argument('--latency', action='store_true', help='measure the input-to-photon latency of mouse motion and print it on exit')
+    parser.add_argument('--late-latch', action='store_true', help='apply the mouse motion right before the camera is uploaded, instead of at the start of the frame')
+    parser.add_argument('--max-frames-in-flight', type=int, default=None, metavar='N', help='wait for the GPU before starting a frame while N frames are queued')
+    parser.add_argument('--trace', default=None, metavar='FILE', help='count and time the GL calls of every frame, written to FILE as a Chrome trace on exit')
+    parser.add_argument('--trace-allocations', action='store_true', help='also measure the memory allocated per frame with tracemalloc, which slows every allocation down')
+    parser.add_argument('--profile', default=None, help='record frame timings and write them to this CSV or JSON file on exit or on F12')
+    arguments = parser.parse_args(argv)
+    if arguments.backend == 'fragment' and arguments.progressive is not None:
+        parser.error('--progressive requires --backend compute')
+    return arguments
+
+
+def main(argv=None):
+    global window, window_id, gl_context, gl_worker, gl_watcher, _gl_scene_manager, gl_thread, gl_loop_alive, gl_loop_running, gl_need_resize, gl_continuous, gl_profiler, gl_profile_filename, gl_profile_dump, gl_tracer, gl_trace_filename, gl_frame_writer, gl_latency, gl_late_latch, gl_max_frames_in_flight, gl_resize_debounce, _gl_resize_time
+
+    arguments = parse_arguments(argv)
+    configure_opengl(arguments.gl_debug)
+    from graphics.scene_manager import SceneManager
+    from graphics.worker import GLWorker
+    from graphics.program_cache import ProgramCache
+    from graphics.profiler import FrameProfiler, NULL_PROFILER
+    from graphics.resolution import DynamicResolution
+    from graphics.progressive import ProgressiveRefinement
+    from scene.sky import SkyScene
+
+    gl_profiler = NULL_PROFILER
+    gl_continuous = arguments.continuous
+    gl_resize_debounce = arguments.resize_debounce / 1000.0
+    if arguments.record is not None:
+        from graphics.writer import FrameWriter
+        # Checked before drawing, the writer thread would otherwise fail every frame and only report it on exit.
+        directory = os.path.dirname(arguments.record) or '.'
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as error:
+            print(f'Cannot record to {arguments.record}: {error}', file=stderr)
+            return 1
+        if not os.access(directory, os.W_OK):
+            print(f'Cannot record to {arguments.record}: {directory} is not writable', file=stderr)
+            return 1
+        try:
+            gl_frame_writer = FrameWriter(arguments.record, queue_size=arguments.record_queue, policy=arguments.record_policy)
+        except (OSError, ValueError) as error:
+            print(f'Cannot record to {arguments.record}: {error}', file=stderr)
+            return 1
+    gl_late_latch = arguments.late_latch
+    gl_max_frames_in_flight = arguments.max_frames_in_flight
+    if arguments.latency:
+        from graphics.latency import LatencyTracker
+        gl_latency = LatencyTracker()
+    if arguments.trace is not None:
+        from graphics.tracer import GLTracer, print_summary
+        gl_tracer = GLTracer(allocations=arguments.trace_allocations)
+        gl_trace_filename = arguments.trace
+    if arguments.profile is not None:
+        gl_profiler = FrameProfiler()
+        gl_profile_filename = arguments.profile
 
     # Default settings*
     # Width and Height will be maximum 1024x768, but no more than 90% of the screen.
@@ -114,15 +303,7 @@ def main():
         raise UIError
 
     # Step 2: Prepare OpenGL attributes, particularly important to get OpenGL 4.6+
-    SDL_GL_SetAttribute(SDL_GL_RED_SIZE, 8)
-    SDL_GL_SetAttribute(SDL_GL_GREEN_SIZE, 8)
-    SDL_GL_SetAttribute(SDL_GL_BLUE_SIZE, 8)
-    SDL_GL_SetAttribute(SDL_GL_ALPHA_SIZE, 8)
-    SDL_GL_SetAttribute(SDL_GL_DOUBLEBUFFER, 1)
-    SDL_GL_SetAttribute(SDL_GL_CONTEXT_MAJOR_VERSION, 4)
-    SDL_GL_SetAttribute(SDL_GL_CONTEXT_MINOR_VERSION, 6)
-    SDL_GL_SetAttribute(SDL_GL_CONTEXT_PROFILE_MASK, SDL_GL_CONTEXT_PROFILE_CORE)
-    SDL_GL_SetAttribute(SDL_GL_CONTEXT_FLAGS, SDL_GL_CONTEXT_FORWARD_COMPATIBLE_FLAG)
+    set_gl_attributes()
 
     # Locate proper position for the window
     display_index = get_display_under_cursor()
@@ -152,13 +333,41 @@ def main():
     gl_context = SDL_GL_CreateContext(window)
     if gl_context is None:
         raise UIError
+    if not arguments.no_worker:
+        try:
+            gl_worker = GLWorker.create()
+        except UIError as error:
+            print(f'Shared OpenGL context is not available, scenes are loaded on the draw thread: {error}', file=stderr)
     SDL_GL_MakeCurrent(None, None)
+    budget = int(arguments.gpu_budget * 1024 * 1024) if arguments.gpu_budget is not None else None
+    if arguments.hot_reload:
+        from graphics.watcher import FileWatcher
+        gl_watcher = FileWatcher(lambda paths: _gl_scene_manager.files_changed(paths))
+    _gl_scene_manager = SceneManager(budget, gl_worker, gl_watcher, wake=_gl_redraw_event.set)
 
     window_id = SDL_GetWindowID(window)
     gl_thread = threading.Thread(target=gl_main, name='DrawThread', daemon=True)
     gl_loop_running.set()
     gl_thread.start()
-    set_scene(SkyScene())
+    program_cache = ProgramCache()
+
+    def create_scene(backend):
+        # Every scene gets its own controllers, their state follows the GPU time of that scene.
+        dynamic_resolution = None
+        if arguments.dynamic_resolution is not None:
+            dynamic_resolution = DynamicResolution(arguments.dynamic_resolution, minimum_scale=arguments.minimum_scale)
+        progressive = None
+        if arguments.progressive is not None and backend == 'compute':
+            progressive = ProgressiveRefinement(arguments.progressive, tile_size=(arguments.tile_size, arguments.tile_size), preview_block=arguments.preview_block)
+        return SkyScene(backend=backend, output_format=arguments.output_format, texture_storage=arguments.texture_storage, dynamic_resolution=dynamic_resolution, progressive=progressive, sky_lut=arguments.sky_lut, program_cache=program_cache)
+
+    scenes = [create_scene(arguments.backend)]
+    set_scene(scenes[0])
+    if arguments.alternate_backend is not None:
+        # Shares the camera, so switching keeps the view; loaded while the first scene is drawn.
+        scenes.append(create_scene(arguments.alternate_backend))
+        scenes[1].camera = scenes[0].camera
+        preload_scene(scenes[1])
 
     mouse_capture = False
     while True:
@@ -171,8 +380,12 @@ def main():
             if event.window.windowID == window_id:
                 if event.window.event == SDL_WINDOWEVENT_CLOSE:
                     break
+                elif event.window.event == SDL_WINDOWEVENT_MOVED or event.window.event == SDL_WINDOWEVENT_DISPLAY_CHANGED:
+                    _invalidate_rotation_size()
                 elif event.window.event == SDL_WINDOWEVENT_SIZE_CHANGED:
+                    _gl_resize_time = time.monotonic()
                     gl_need_resize = True
+                    _gl_redraw_event.set()
                 elif event.window.event == SDL_WINDOWEVENT_FOCUS_LOST:
                     gl_loop_running.clear()
                     if SDL_SetRelativeMouseMode(0) < 0:
@@ -182,6 +395,16 @@ def main():
                     gl_loop_running.set()
                 elif event.window.event == SDL_WINDOWEVENT_EXPOSED:
                     gl_loop_running.set()
+                    request_redraw()
+        elif event.type == SDL_DISPLAYEVENT:
+            _invalidate_rotation_size()
+        elif event.type == SDL_KEYDOWN:
+            if event.key.windowID == window_id and event.key.keysym.sym == SDLK_F12 and gl_profile_filename is not None:
+                gl_profile_dump = True
+                request_redraw()
+            elif event.key.windowID == window_id and event.key.keysym.sym == SDLK_F2 and len(scenes) > 1 and event.key.repeat == 0:
+                scenes.append(scenes.pop(0))
+                set_scene(scenes[0])
         elif event.type == SDL_MOUSEBUTTONDOWN:
             if event.button.windowID == window_id and event.button.button == SDL_BUTTON_LEFT:
                 SDL_RaiseWindow(window)
@@ -195,49 +418,127 @@ def main():
                 mouse_capture = False
         elif event.type == SDL_MOUSEMOTION:
             if event.motion.windowID == window_id and mouse_capture:
-                x = ctypes.c_int()
-                y = ctypes.c_int()
-                w = ctypes.c_int()
-                h = ctypes.c_int()
-                SDL_GetWindowPosition(window, x, y)
-                SDL_GetWindowSize(window, w, h)
-                db = get_display_bounds()
-                display = 0
-                for index in range(len(db)):
-                    bounds = db[index]
-                    if x.value >= bounds.x and x.value < bounds.x + bounds.w and y.value <= bounds.y and y.value < bounds.y + bounds.h:
-                        display = index
-                        break
-                bounds = db[display]
-                rotation_size = min(bounds.w, bounds.h)
-                delta_x = (event.motion.xrel / rotation_size) * math.pi * 2
-                delta_y = (event.motion.yrel / rotation_size) * math.pi * 2
-                if _gl_scene_active is not None and _gl_scene_active.camera is not None:
-                    _gl_scene_active.camera.rotate(delta_x, delta_y)
-                
+                _accumulate_mouse_motion(event.motion.xrel, event.motion.yrel, event.motion.timestamp)
 
     _join_draw_thread()
+    if gl_watcher is not None:
+        gl_watcher.close()
+        gl_watcher = None
+    if gl_worker is not None:
+        gl_worker.release()
+        gl_worker = None
+    if gl_frame_writer is not None:
+        gl_frame_writer.close()
+        print(f'Recorded {gl_frame_writer.written} frames, dropped {gl_capture_dropped} in the capture ring and {gl_frame_writer.dropped} in the writer queue', file=stderr)
+    if gl_profile_filename is not None:
+        gl_profiler.dump(gl_profile_filename)
+        for name, clocks in gl_profiler.summary().items():
+            print(name, ', '.join(f'{clock} p50 {entry["p50_ms"]:.3f} ms p95 {entry["p95_ms"]:.3f} ms p99 {entry["p99_ms"]:.3f} ms' for clock, entry in clocks.items()), file=stderr)
+    if gl_tracer is not None:
+        gl_tracer.uninstall()
+        gl_tracer.dump(gl_trace_filename)
+        print_summary(gl_tracer.summary(), stderr)
+    if gl_latency is not None:
+        for name, entry in gl_latency.summary().items():
+            print(f'Input to {name}: {entry["count"]} frames, p50 {entry["p50_ms"]:.3f} ms p95 {entry["p95_ms"]:.3f} ms p99 {entry["p99_ms"]:.3f} ms max {entry["max_ms"]:.3f} ms', file=stderr)
     SDL_Quit()
     return 0
 
+def _get_rotation_size():
+    # A mouse movement across the smaller side of the display is a full turn.
+    global _rotation_size
+    if _rotation_size is None:
+        x = ctypes.c_int()
+        y = ctypes.c_int()
+        SDL_GetWindowPosition(window, x, y)
+        db = get_display_bounds()
+        display = 0
+        for index in range(len(db)):
+            bounds = db[index]
+            if x.value >= bounds.x and x.value < bounds.x + bounds.w and y.value >= bounds.y and y.value < bounds.y + bounds.h:
+                display = index
+                break
+        bounds = db[display]
+        _rotation_size = min(bounds.w, bounds.h)
+    return _rotation_size
+
+
+def _invalidate_rotation_size():
+    global _rotation_size
+    _rotation_size = None
+
+
+def _sdl_event_time(timestamp):
+    # Converts the SDL_GetTicks() milliseconds of an event to the perf_counter_ns() clock of the latency tracker,
+    # so the time the event waited in the SDL queue is part of the latency. The ticks wrap around after 49 days.
+    age = (SDL_GetTicks() - timestamp) & 0xFFFFFFFF
+    return time.perf_counter_ns() - age * 1000000
+
+
+def _accumulate_mouse_motion(xrel, yrel, timestamp=None):
+    global _mouse_delta_x, _mouse_delta_y
+    rotation_size = _get_rotation_size()
+    with _mouse_lock:
+        if gl_latency is not None:
+            gl_latency.input(_sdl_event_time(timestamp) if timestamp is not None else None)
+        _mouse_delta_x += (xrel / rotation_size) * math.pi * 2
+        _mouse_delta_y += (yrel / rotation_size) * math.pi * 2
+    _gl_redraw_event.set()
+
+
+def _has_mouse_motion():
+    with _mouse_lock:
+        return _mouse_delta_x != 0.0 or _mouse_delta_y != 0.0
+
+
+def _apply_mouse_motion(scene):
+    global _mouse_delta_x, _mouse_delta_y, _frame_input_time
+    with _mouse_lock:
+        delta_x = _mouse_delta_x
+        delta_y = _mouse_delta_y
+        _mouse_delta_x = 0.0
+        _mouse_delta_y = 0.0
+        # Latched under the same lock, so the timestamp belongs to the motion applied here.
+        input_time = gl_latency.latch() if gl_latency is not None else None
+    if input_time is not None and _frame_input_time is None:
+        _frame_input_time = input_time
+    if (delta_x != 0.0 or delta_y != 0.0) and scene.camera is not None:
+        scene.camera.rotate(delta_x, delta_y)
+
+
 def _join_draw_thread():
     global window, gl_loop_alive
     gl_loop_alive = False
     if gl_thread.is_alive():
         gl_loop_running.set()
         _gl_scene_active_event.set()
+        _gl_redraw_event.set()
         gl_thread.join()
     if window is not None:
         SDL_DestroyWindow(window)
         window = None
         window_id = 0
         
-def set_scene(scene: Scene):
+def set_scene(scene):
     global _gl_scene_next
     with _gl_scene_lock:
         if scene != _gl_scene_active:
             _gl_scene_next = scene
             _gl_scene_active_event.set()
+            _gl_redraw_event.set()
+
+
+def preload_scene(scene):
+    # Loads and initializes the scene in the background, so a later set_scene() does not stall the draw thread.
+    _gl_scene_manager.preload(scene)
+    _gl_redraw_event.set()
+
+
+def request_redraw():
+    # Repaint the active scene even if it is not dirty, e.g. when the window content was damaged.
+    global gl_need_redraw
+    gl_need_redraw = True
+    _gl_redraw_event.set()
 
 if __name__ == '__main__':
     exit(main())
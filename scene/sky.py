@@ -1,61 +1,366 @@
 from graphics.scene import Scene
-from graphics.gl import gl_create_shader_from_source, gl_create_program, gl_get_program_uniforms
+from graphics.gl import gl_read_shader_source, gl_delete_program, ShaderCompileError, ProgramLinkError
+from graphics.program_cache import ProgramCache, create_program_async
 from graphics.camera import MouseCamera
+from graphics.uniform import PersistentUniformBuffer
+from graphics.texture import ResizableTexture, IMAGE_FORMATS
+from graphics.profiler import GpuTimer
+from graphics.resolution import DynamicResolution
+from graphics.progressive import ProgressiveRefinement
 from OpenGL.GL import *
 from OpenGL.arrays import GLuintArray
+import numpy
+from scene.sky_model import SKY_FIELD_OF_VIEW, DEFAULT_SKY, SkyParameters, sky_block
 import __main__
 
+# 'compute' writes the frame into a texture with imageStore() and blits it to the framebuffer, 'fragment' draws a
+# fullscreen triangle straight into the framebuffer, which saves a full screen write and read per frame.
+SKY_BACKENDS = ('compute', 'fragment')
+
 
 class SkyScene(Scene):
-    def __init__(self):
-        with open('shader/sky-scene.glsl', 'rb') as file:
-            self.camera_source = file.read()
-        self.camera = MouseCamera(field_of_view=160)
+    def __init__(self, *, backend='compute', local_size=(16, 16), output_format='rgba8', texture_storage='grow', dynamic_resolution: DynamicResolution = None, progressive: ProgressiveRefinement = None, sky: SkyParameters = DEFAULT_SKY, sky_lut: int = None, program_cache: ProgramCache = None):
+        if backend not in SKY_BACKENDS:
+            raise ValueError(f'Unknown sky backend: {backend}')
+        if backend == 'fragment' and progressive is not None:
+            raise ValueError('Progressive rendering requires the compute backend')
+        self.backend = backend
+        # The compute shader is built for a 2D tile of local_size pixels, e.g. (8, 8), (16, 16) or (32, 8).
+        self.local_size = tuple(local_size)
+        # The sky colors fit in 8 bits per channel, wider formats only cost memory bandwidth.
+        self.output_format = output_format
+        self.texture_storage = texture_storage
+        # When set, the scene renders at a fraction of the screen size and upscales it with a filtered blit.
+        self.dynamic_resolution = dynamic_resolution
+        self.scale = 1.0
+        # When set, the frame is rendered in tiles over several frames within a GPU time budget.
+        self.progressive = progressive
+        self.program_cache = program_cache
+        self.playing = False
+        # Assigning a new SkyParameters uploads it on the next frame, and bakes it again when sky_lut is used.
+        self.sky = sky
+        self.sky_uploaded = None
+        # The sky of the pixels in the screen texture, a progressive frame restarts when it changes.
+        self.sky_drawn = None
+        # When set, the sky is baked into a cube map of sky_lut x sky_lut faces, which each pixel samples once.
+        self.sky_lut = sky_lut
+        self.source_files = set()
+        self.camera_defines = {
+            'LOCAL_SIZE_X': self.local_size[0],
+            'LOCAL_SIZE_Y': self.local_size[1],
+            'OUTPUT_FORMAT': IMAGE_FORMATS[output_format][1]
+        }
+        if self.sky_lut is not None:
+            self.camera_defines['SKY_LUT'] = 1
+        if self.progressive is not None:
+            self.camera_defines['PROGRESSIVE'] = 1
+        self.camera = MouseCamera(field_of_view=SKY_FIELD_OF_VIEW)
+        # std140 layout of the Camera uniform block, see shader/sky-scene.glsl
+        self.camera_block = numpy.zeros(20, dtype=numpy.float32)
+        self.camera_block_int = self.camera_block.view(numpy.int32)
+        self.camera_version = None
+        self.pending_programs = None
+        self.reload_programs = None
+
+    def _create_programs(self):
+        # The sources are read again on every load, so a scene released and initialized again sees the edits as well.
+        files = set()
+        if self.backend == 'fragment':
+            shaders = [(GL_VERTEX_SHADER, gl_read_shader_source('sky-fullscreen.glsl', files)), (GL_FRAGMENT_SHADER, gl_read_shader_source('sky-fragment.glsl', files))]
+        else:
+            shaders = [(GL_COMPUTE_SHADER, gl_read_shader_source('sky-scene.glsl', files))]
+        programs = [create_program_async(shaders, self.camera_defines, self.program_cache)]
+        if self.sky_lut is not None:
+            programs.append(create_program_async([(GL_COMPUTE_SHADER, gl_read_shader_source('sky-bake.glsl', files))], {}, self.program_cache))
+        self.source_files = files
+        return programs
+
+    def on_load(self):
+        self.pending_programs = self._create_programs()
+
+    def shader_files(self):
+        return self.source_files
+
+    def on_reload(self):
+        self.reload_programs = self._create_programs()
+
+    def is_reloaded(self):
+        return self.reload_programs is not None and all(program.is_complete() for program in self.reload_programs)
+
+    def apply_reload(self):
+        pending, self.reload_programs = self.reload_programs, None
+        programs = []
+        error = None
+        for program in pending:
+            try:
+                programs.append(program.result())
+            except (ShaderCompileError, ProgramLinkError) as exception:
+                error = error or exception
+        if error is not None:
+            for program in programs:
+                gl_delete_program(program)
+            raise error
+        gl_delete_program(self.camera_program)
+        self.camera_program = programs[0]
+        if self.sky_texture is not None:
+            gl_delete_program(self.bake_program)
+            self.bake_program = programs[1]
+        # Paint, bake and restart a progressive frame with the new programs.
+        self.camera_version = None
+        self.sky_uploaded = None
+        self.sky_drawn = None
+
+    def is_loaded(self):
+        return self.pending_programs is not None and all(program.is_complete() for program in self.pending_programs)
 
     def on_initialize(self):
-        self.camera_program = gl_create_program(
-            gl_create_shader_from_source(GL_COMPUTE_SHADER, self.camera_source)
-        )
-        self.camera_uniform = gl_get_program_uniforms(self.camera_program)
-        self.screen_texture = GLuint()
-        glCreateTextures(GL_TEXTURE_RECTANGLE, 1, self.screen_texture)
+        if self.pending_programs is None:
+            self.on_load()
+        programs = [program.result() for program in self.pending_programs]
+        self.pending_programs = None
+        self.camera_program = programs[0]
+        self.camera_buffer = PersistentUniformBuffer(self.camera_block.nbytes)
+        self.camera_version = None
+        self.screen_texture = ResizableTexture(GL_TEXTURE_RECTANGLE, self.output_format, self.texture_storage)
+        self.gpu_timer = GpuTimer() if self.dynamic_resolution is not None or self.progressive is not None else None
+        self.vertex_array = None
+        if self.backend == 'fragment':
+            # The fullscreen triangle has no vertex attributes, but drawing requires a vertex array object.
+            vertex_array = GLuint()
+            glCreateVertexArrays(1, vertex_array)
+            self.vertex_array = vertex_array.value
+        self.sky_buffer = GLuint()
+        glCreateBuffers(1, self.sky_buffer)
+        glNamedBufferStorage(self.sky_buffer, sky_block(self.sky).nbytes, None, GL_DYNAMIC_STORAGE_BIT)
+        self.sky_uploaded = None
+        self.sky_texture = None
+        if self.sky_lut is not None:
+            self.bake_program = programs[1]
+            sky_texture = GLuint()
+            glCreateTextures(GL_TEXTURE_CUBE_MAP, 1, sky_texture)
+            self.sky_texture = sky_texture.value
+            glTextureStorage2D(self.sky_texture, 1, GL_RGBA16F, self.sky_lut, self.sky_lut)
+            glTextureParameteri(self.sky_texture, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+            glTextureParameteri(self.sky_texture, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+            glTextureParameteri(self.sky_texture, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+            glTextureParameteri(self.sky_texture, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+            # Filter across the face edges, otherwise the seams are visible.
+            glEnable(GL_TEXTURE_CUBE_MAP_SEAMLESS)
 
     def on_release(self):
-        for shader in glGetAttachedShaders(self.camera_program):
-            glDeleteShader(shader)
-        glDeleteProgram(self.camera_program)
+        gl_delete_program(self.camera_program)
         self.camera_program = None
-        
-    def on_play(self):
+        glDeleteBuffers(1, [self.sky_buffer.value])
+        self.sky_buffer = None
+        if self.sky_texture is not None:
+            gl_delete_program(self.bake_program)
+            self.bake_program = None
+            glDeleteTextures(1, [self.sky_texture])
+            self.sky_texture = None
+        self.camera_buffer.release()
+        self.camera_buffer = None
+        self.screen_texture.release()
+        self.screen_texture = None
+        if self.vertex_array is not None:
+            glDeleteVertexArrays(1, [self.vertex_array])
+            self.vertex_array = None
+        if self.gpu_timer is not None:
+            self.gpu_timer.release()
+            self.gpu_timer = None
+
+    def gpu_memory(self):
+        size = self.screen_texture.memory()
+        size += self.camera_buffer.stride * self.camera_buffer.count + sky_block(self.sky).nbytes
+        if self.sky_texture is not None:
+            size += self.sky_lut * self.sky_lut * 6 * 8
+        return size
+
+    def _attach_screen_texture(self):
+        if self.screen_texture.texture is None:
+            return
         glBindFramebuffer(GL_READ_FRAMEBUFFER, __main__.gl_framebuffer)
-        glFramebufferTexture2D(GL_READ_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_RECTANGLE, self.screen_texture, 0)
+        glFramebufferTexture2D(GL_READ_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_RECTANGLE, self.screen_texture.texture, 0)
         glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
-        
+
+    def on_play(self):
+        # Another scene may have used the uniform buffer and texture bindings, bind the camera and sky again.
+        # The baked sky is still valid, it is only baked again for new parameters or reloaded programs.
+        self.camera_version = None
+        if self.sky_uploaded is not None:
+            self._bind_sky()
+        self.playing = True
+        self._attach_screen_texture()
+
     def on_stop(self):
+        self.playing = False
         glBindFramebuffer(GL_READ_FRAMEBUFFER, __main__.gl_framebuffer)
         glFramebufferTexture(GL_READ_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, 0, 0)
         glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
 
     def on_resize(self, width, height):
         super().on_resize(width, height)
-        self.camera.set_screen_size(width, height)
         self.width = width
         self.height = height
-        glBindTexture(GL_TEXTURE_RECTANGLE, self.screen_texture)
-        glTexImage2D(GL_TEXTURE_RECTANGLE, 0, GL_RGBA32F, width, height, 0, GL_RGBA, GL_FLOAT, None)
+        self._resize_render()
 
-    def on_paint(self):
-        glUseProgram(self.camera_program)
-        glUniform2i(self.camera_uniform['screen_size'], self.camera.screen_width, self.camera.screen_height)
-        glUniform2f(self.camera_uniform['view_size'], self.camera.view_width, self.camera.view_height)
-        screen_center = self.camera.position + self.camera.screen_distance * self.camera.view_front
-        glUniform3f(self.camera_uniform['screen_center'], *screen_center)
-        glUniform3f(self.camera_uniform['camera_position'], *self.camera.position)
-        glUniform3f(self.camera_uniform['camera_up'], *self.camera.view_up)
-        glUniform3f(self.camera_uniform['camera_right'], *self.camera.view_right)
-        glBindImageTexture(0, self.screen_texture, 0, GL_TRUE, 0, GL_WRITE_ONLY, GL_RGBA32F)
-        glDispatchCompute(self.camera.screen_width, self.camera.screen_height, 1)
+    def _resize_render(self):
+        # The camera and the texture follow the render size, which is the screen size multiplied by the scale.
+        render_width = max(1, round(self.width * self.scale))
+        render_height = max(1, round(self.height * self.scale))
+        if (render_width, render_height) != (self.camera.screen_width, self.camera.screen_height):
+            self.camera.set_screen_size(render_width, render_height)
+        # The fragment backend only renders into the texture when it has to be scaled to the screen.
+        if self.backend == 'fragment' and (render_width, render_height) == (self.width, self.height):
+            return
+        if self.screen_texture.resize(render_width, render_height) and self.playing:
+            self._attach_screen_texture()
+
+    def _poll_gpu_timer(self):
+        # Keys are None for whole frames, ('preview',) and ('tiles', count) for the progressive passes.
+        gpu_time = None
+        for key, elapsed in self.gpu_timer.poll():
+            if key is None:
+                gpu_time = elapsed
+            elif key[0] == 'preview':
+                self.progressive.update_preview(elapsed / 1e6)
+            else:
+                self.progressive.update_tiles(key[1], elapsed / 1e6)
+        if gpu_time is not None and self.dynamic_resolution is not None:
+            scale = self.dynamic_resolution.update(gpu_time / 1e6)
+            if scale != self.scale:
+                self.scale = scale
+                self._resize_render()
+
+    def is_dirty(self):
+        # The output depends only on the camera, which includes the screen size, and the sky parameters.
+        # A progressive frame stays dirty until its last tile is rendered.
+        if self.progressive is not None and not self.progressive.is_complete():
+            return True
+        return self.camera.snapshot.version != self.camera_version or self.sky is not self.sky_uploaded
+
+    def _update_sky(self, sky):
+        self.sky_uploaded = sky
+        block = sky_block(sky)
+        glNamedBufferSubData(self.sky_buffer, 0, block.nbytes, block)
+        # The bake reads the parameters from the bound sky block.
+        self._bind_sky()
+        if self.sky_texture is not None:
+            # The baked sky only changes with the parameters, not with the camera.
+            glUseProgram(self.bake_program)
+            glBindImageTexture(0, self.sky_texture, 0, GL_TRUE, 0, GL_WRITE_ONLY, GL_RGBA16F)
+            groups = (self.sky_lut + 7) // 8
+            glDispatchCompute(groups, groups, 6)
+            glMemoryBarrier(GL_TEXTURE_FETCH_BARRIER_BIT)
+
+    def _bind_sky(self):
+        glBindBufferBase(GL_UNIFORM_BUFFER, 1, self.sky_buffer)
+        if self.sky_texture is not None:
+            glBindTextureUnit(0, self.sky_texture)
+
+    def _dispatch_groups(self, width, height):
+        return (width + self.local_size[0] - 1) // self.local_size[0], (height + self.local_size[1] - 1) // self.local_size[1]
+
+    def _dispatch_progressive(self, camera, restart):
+        progressive = self.progressive
+        if restart:
+            # The pixels of the previous camera are stale, they are replaced by the preview or the tiles.
+            progressive.reset(camera.screen_width, camera.screen_height)
+        preview, tiles = progressive.plan(restart)
+        if preview:
+            block = progressive.preview_block
+            start = self.gpu_timer.timestamp()
+            glUniform2i(0, 0, 0)
+            glUniform1i(1, block)
+            glDispatchCompute(*self._dispatch_groups(-(-camera.screen_width // block), -(-camera.screen_height // block)), 1)
+            self.gpu_timer.submit(('preview',), start, self.gpu_timer.timestamp())
+        if tiles:
+            if preview:
+                # The tiles overwrite texels of the preview blocks, their stores must land after the preview ones.
+                glMemoryBarrier(GL_SHADER_IMAGE_ACCESS_BARRIER_BIT)
+            start = self.gpu_timer.timestamp()
+            glUniform1i(1, 1)
+            for x, y, width, height in tiles:
+                glUniform2i(0, x, y)
+                glDispatchCompute(*self._dispatch_groups(width, height), 1)
+            self.gpu_timer.submit(('tiles', len(tiles)), start, self.gpu_timer.timestamp())
 
+    def _blit(self, camera):
         glBindFramebuffer(GL_READ_FRAMEBUFFER, __main__.gl_framebuffer)
-        glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height, GL_COLOR_BUFFER_BIT, GL_NEAREST)
+        if camera.screen_width == self.width and camera.screen_height == self.height:
+            glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height, GL_COLOR_BUFFER_BIT, GL_NEAREST)
+        else:
+            glBlitFramebuffer(0, 0, camera.screen_width, camera.screen_height, 0, 0, self.width, self.height, GL_COLOR_BUFFER_BIT, GL_LINEAR)
         glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
+
+    def _dispatch_compute(self, camera, restart):
+        profiler = self.profiler
+        with profiler.phase('dispatch'):
+            glBindImageTexture(0, self.screen_texture.texture, 0, GL_TRUE, 0, GL_WRITE_ONLY, self.screen_texture.internal_format)
+            if self.progressive is not None:
+                self._dispatch_progressive(camera, restart)
+            else:
+                # Round up to whole tiles, the shader discards the invocations outside the screen.
+                group_x = (camera.screen_width + self.local_size[0] - 1) // self.local_size[0]
+                group_y = (camera.screen_height + self.local_size[1] - 1) // self.local_size[1]
+                glDispatchCompute(group_x, group_y, 1)
+            # The image stores must be visible to the blit below.
+            glMemoryBarrier(GL_FRAMEBUFFER_BARRIER_BIT)
+
+        with profiler.phase('blit'):
+            self._blit(camera)
+
+    def _draw_fragment(self, camera):
+        profiler = self.profiler
+        glBindVertexArray(self.vertex_array)
+        if camera.screen_width == self.width and camera.screen_height == self.height:
+            with profiler.phase('draw'):
+                # Straight into the bound draw framebuffer, the back buffer or the target of headless rendering.
+                glDrawArrays(GL_TRIANGLES, 0, 3)
+            return
+        # A scaled frame is drawn into the screen texture and upscaled by the same blit as the compute backend.
+        with profiler.phase('draw'):
+            target = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, __main__.gl_framebuffer)
+            glViewport(0, 0, camera.screen_width, camera.screen_height)
+            glDrawArrays(GL_TRIANGLES, 0, 3)
+            glViewport(0, 0, self.width, self.height)
+            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, target)
+        with profiler.phase('blit'):
+            self._blit(camera)
+
+    def on_paint(self):
+        profiler = self.profiler
+        if self.gpu_timer is not None:
+            self._poll_gpu_timer()
+            gpu_start = self.gpu_timer.timestamp()
+        sky = self.sky
+        if sky is not self.sky_uploaded:
+            with profiler.phase('bake'):
+                self._update_sky(sky)
+        glUseProgram(self.camera_program)
+        if self.input_latch is not None:
+            self.input_latch()
+        # Read once, the event thread may publish a new snapshot at any time.
+        camera = self.camera.snapshot
+        restart = camera.version != self.camera_version or sky is not self.sky_drawn
+        self.sky_drawn = sky
+        if camera.version != self.camera_version:
+            with profiler.phase('upload'):
+                self.camera_version = camera.version
+                block = self.camera_block
+                self.camera_block_int[0:2] = (camera.screen_width, camera.screen_height)
+                block[2:4] = (camera.view_width, camera.view_height)
+                block[4:7] = camera.screen_center
+                block[8:11] = camera.position
+                block[12:15] = camera.view_up
+                block[16:19] = camera.view_right
+                self.camera_buffer.write(self.camera_block)
+                self.camera_buffer.bind(0)
+        if self.backend == 'fragment':
+            self._draw_fragment(camera)
+        else:
+            self._dispatch_compute(camera, restart)
+        self.camera_buffer.fence()
+
+        if self.gpu_timer is not None:
+            self.gpu_timer.submit(None, gpu_start, self.gpu_timer.timestamp())
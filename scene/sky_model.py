@@ -0,0 +1,123 @@
+import math
+import numpy
+from collections import namedtuple
+
+# CPU implementation of shader/sky-model.glsl, EPSILON must be kept in sync with the shader.
+EPSILON = 2.220446049250313e-16
+COLOR_SKY = (0.09, 0.626, 0.9)
+COLOR_SKY_HORIZON = (0.34, 0.68, 0.85)
+COLOR_GROUND_HORIZON = (0.75, 0.75, 0.75)
+COLOR_GROUND = (0.5, 0.5, 0.5)
+SIZE_HORIZON = 0.2
+# Field of view of the camera used by SkyScene.
+SKY_FIELD_OF_VIEW = 160
+
+# Parameters of the sky model, uploaded to the Sky uniform block of the shaders.
+# Immutable, so a change is a new instance, which renderers detect by identity.
+SkyParameters = namedtuple('SkyParameters', [
+    'color_sky',
+    'color_sky_horizon',
+    'color_ground_horizon',
+    'color_ground',
+    'size_horizon'
+], defaults=[COLOR_SKY, COLOR_SKY_HORIZON, COLOR_GROUND_HORIZON, COLOR_GROUND, SIZE_HORIZON])
+
+DEFAULT_SKY = SkyParameters()
+
+
+def sky_block(sky: SkyParameters):
+    # std140 layout of the Sky uniform block: four vec3 at 16 bytes stride, size_horizon packed after the last one.
+    block = numpy.zeros(16, dtype=numpy.float32)
+    block[0:3] = sky.color_sky
+    block[4:7] = sky.color_sky_horizon
+    block[8:11] = sky.color_ground_horizon
+    block[12:15] = sky.color_ground
+    block[15] = sky.size_horizon
+    return block
+
+
+def _horizon_blend(sky, dtype):
+    # Each of the three horizon bands is a linear blend: color = base + (scale * z + offset) * delta
+    # Index 0 is the sky, 1 is the ground and 2 is the band around the horizon.
+    h = sky.size_horizon
+    base = numpy.array([sky.color_sky_horizon, sky.color_ground_horizon, sky.color_ground_horizon], dtype=dtype)
+    delta = numpy.array([sky.color_sky, sky.color_ground, sky.color_sky_horizon], dtype=dtype) - base
+    scale = numpy.array([1.0 / (1.0 - h), -1.0 / (1.0 - h), 1.0 / (2.0 * h)], dtype=dtype)
+    offset = numpy.array([-h / (1.0 - h), -h / (1.0 - h), 0.5], dtype=dtype)
+    return base, delta, scale, offset
+
+
+def sky_color(direction: numpy.ndarray, out: numpy.ndarray = None, sky: SkyParameters = DEFAULT_SKY):
+    # Color of normalized ray directions of shape (..., 3), written into out of shape (..., 3) or (..., 4).
+    dtype = direction.dtype
+    if out is None:
+        out = numpy.empty(direction.shape, dtype=dtype)
+    base, delta, scale, offset = _horizon_blend(sky, dtype)
+
+    sky_z = direction[..., 2]
+    band = numpy.full(sky_z.shape, 2, dtype=numpy.intp)
+    band[sky_z >= sky.size_horizon] = 0
+    band[sky_z <= -sky.size_horizon] = 1
+    nuance = scale[band] * sky_z + offset[band]
+
+    # atan(x, y) in GLSL is atan2(x, y): the angle from the North (+Y) axis.
+    cm = 1.0 - numpy.abs(numpy.arctan2(direction[..., 0], direction[..., 1])) / numpy.asarray(math.pi, dtype=dtype)
+    cm[numpy.abs(direction[..., 0]) < EPSILON] = 1.0
+
+    color = out[..., :3]
+    numpy.multiply(nuance[..., None], delta[band], out=color)
+    color += base[band]
+    color *= cm[..., None]
+    if out.shape[-1] == 4:
+        out[..., 3] = 1.0
+    return out
+
+
+def render_sky(camera, out: numpy.ndarray = None, *, sky: SkyParameters = DEFAULT_SKY, rows_per_chunk: int = 64, dtype=numpy.float32):
+    # Renders the frame the compute shader would produce for the camera, as (height, width, 4) RGBA.
+    # Row 0 is the bottom of the screen, like the OpenGL texture. The frame is computed in bands of rows_per_chunk
+    # rows, so the temporaries never exceed a few bands, independent of the frame size.
+    snapshot = camera.snapshot
+    width = snapshot.screen_width
+    height = snapshot.screen_height
+    if out is None:
+        out = numpy.empty((height, width, 4), dtype=dtype)
+    dtype = out.dtype
+
+    half_width = width * 0.5
+    half_height = height * 0.5
+    rectangle_x = ((numpy.arange(width, dtype=dtype) - half_width) / half_width) * dtype.type(snapshot.view_width)
+    rectangle_y = ((numpy.arange(height, dtype=dtype) - half_height) / half_height) * dtype.type(snapshot.view_height)
+    origin = (numpy.array(snapshot.screen_center) - numpy.array(snapshot.position)).astype(dtype)
+    right = numpy.array(snapshot.view_right, dtype=dtype)
+    up = numpy.array(snapshot.view_up, dtype=dtype)
+
+    # Ray direction = origin + x * right + y * up; the x term is shared by every row.
+    row_direction = origin + rectangle_x[:, None] * right
+    for start in range(0, height, rows_per_chunk):
+        stop = min(start + rows_per_chunk, height)
+        direction = rectangle_y[start:stop, None, None] * up + row_direction[None, :, :]
+        direction /= numpy.sqrt(numpy.einsum('...i,...i->...', direction, direction))[..., None]
+        sky_color(direction, out[start:stop], sky)
+    return out
+
+
+def render_panorama(width: int, height: int, start: int, stop: int, out: numpy.ndarray = None, *, sky: SkyParameters = DEFAULT_SKY, rows_per_chunk: int = 64, dtype=numpy.float32):
+    # Renders rows start to stop of an equirectangular panorama of the whole sphere as (stop - start, width, 3) RGB.
+    # Row 0 is the top of the image, straight up, the center column looks North (+Y), longitude grows to the East (+X).
+    if out is None:
+        out = numpy.empty((stop - start, width, 3), dtype=dtype)
+    dtype = numpy.dtype(dtype)
+    longitude = ((numpy.arange(width, dtype=numpy.float64) + 0.5) / width * 2.0 - 1.0) * math.pi
+    sin_longitude = numpy.sin(longitude).astype(dtype)
+    cos_longitude = numpy.cos(longitude).astype(dtype)
+    for chunk_start in range(start, stop, rows_per_chunk):
+        chunk_stop = min(chunk_start + rows_per_chunk, stop)
+        latitude = (0.5 - (numpy.arange(chunk_start, chunk_stop, dtype=numpy.float64) + 0.5) / height) * math.pi
+        cos_latitude = numpy.cos(latitude).astype(dtype)[:, None]
+        direction = numpy.empty((chunk_stop - chunk_start, width, 3), dtype=dtype)
+        direction[..., 0] = cos_latitude * sin_longitude
+        direction[..., 1] = cos_latitude * cos_longitude
+        direction[..., 2] = numpy.sin(latitude).astype(dtype)[:, None]
+        sky_color(direction, out[chunk_start - start:chunk_stop - start], sky)
+    return out
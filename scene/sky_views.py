@@ -0,0 +1,90 @@
+import numpy
+from OpenGL.GL import *
+from graphics.gl import gl_read_shader_source, gl_delete_program
+from graphics.camera import view_bases, view_size
+from graphics.program_cache import ProgramCache, create_program
+from graphics.texture import IMAGE_FORMATS
+from scene.sky_model import SKY_FIELD_OF_VIEW, DEFAULT_SKY, SkyParameters, sky_block
+
+
+class SkyViews:
+    # Renders `count` views of the sky, each width x height pixels, into the layers of a 2D texture array with a single
+    # dispatch, e.g. the cells of a thumbnail grid, or the two eyes of a stereo pair with different positions.
+    def __init__(self, width: int, height: int, count: int, *, local_size=(8, 8), output_format='rgba8', field_of_view=SKY_FIELD_OF_VIEW, screen_distance=1.0, sky: SkyParameters = DEFAULT_SKY, program_cache: ProgramCache = None):
+        self.width = width
+        self.height = height
+        self.count = count
+        self.local_size = tuple(local_size)
+        self.internal_format = IMAGE_FORMATS[output_format][0]
+        self.screen_distance = screen_distance
+        self.view_size = view_size(width, height, field_of_view, screen_distance)
+        # std430 layout of the Views buffer, see shader/sky-views.glsl
+        self.views = numpy.zeros((count, 20), dtype=numpy.float32)
+
+        defines = {
+            'LOCAL_SIZE_X': self.local_size[0],
+            'LOCAL_SIZE_Y': self.local_size[1],
+            'OUTPUT_FORMAT': IMAGE_FORMATS[output_format][1]
+        }
+        self.program = create_program([(GL_COMPUTE_SHADER, gl_read_shader_source('sky-views.glsl'))], defines, program_cache)
+        texture = GLuint()
+        glCreateTextures(GL_TEXTURE_2D_ARRAY, 1, texture)
+        self.texture = texture.value
+        glTextureStorage3D(self.texture, 1, self.internal_format, width, height, count)
+        self.view_buffer = GLuint()
+        glCreateBuffers(1, self.view_buffer)
+        glNamedBufferStorage(self.view_buffer, self.views.nbytes, None, GL_DYNAMIC_STORAGE_BIT)
+        block = sky_block(sky)
+        self.sky_buffer = GLuint()
+        glCreateBuffers(1, self.sky_buffer)
+        glNamedBufferStorage(self.sky_buffer, block.nbytes, block, 0)
+
+    def render(self, yaw, pitch, roll=0.0, position=(0.0, 0.0, 0.0)):
+        # Angles broadcast to `count` poses, position to (count, 3), e.g. to offset the eyes of a stereo pair.
+        yaw, pitch, roll = (numpy.broadcast_to(numpy.asarray(angle, dtype=numpy.float64), (self.count,)) for angle in (yaw, pitch, roll))
+        front, up, right = view_bases(yaw, pitch, roll)
+        position = numpy.broadcast_to(numpy.asarray(position, dtype=numpy.float64), (self.count, 3))
+        views = self.views
+        views[:, 0:3] = position + self.screen_distance * front
+        views[:, 4:7] = position
+        views[:, 8:11] = up
+        views[:, 12:15] = right
+        views[:, 16:18] = self.view_size
+        glNamedBufferSubData(self.view_buffer, 0, views.nbytes, views)
+
+        glUseProgram(self.program)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 0, self.view_buffer)
+        glBindBufferBase(GL_UNIFORM_BUFFER, 1, self.sky_buffer)
+        glBindImageTexture(0, self.texture, 0, GL_TRUE, 0, GL_WRITE_ONLY, self.internal_format)
+        group_x = (self.width + self.local_size[0] - 1) // self.local_size[0]
+        group_y = (self.height + self.local_size[1] - 1) // self.local_size[1]
+        glDispatchCompute(group_x, group_y, self.count)
+        # The layers may be sampled, blitted or read back next.
+        glMemoryBarrier(GL_TEXTURE_FETCH_BARRIER_BIT | GL_FRAMEBUFFER_BARRIER_BIT | GL_TEXTURE_UPDATE_BARRIER_BIT)
+
+    def read(self):
+        # Returns (count, height, width, 4) unsigned bytes, bottom row first.
+        pixels = numpy.empty((self.count, self.height, self.width, 4), dtype=numpy.uint8)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glGetTextureImage(self.texture, 0, GL_RGBA, GL_UNSIGNED_BYTE, pixels.nbytes, pixels)
+        return pixels
+
+    def release(self):
+        gl_delete_program(self.program)
+        self.program = None
+        glDeleteTextures(1, [self.texture])
+        self.texture = None
+        glDeleteBuffers(2, [self.view_buffer.value, self.sky_buffer.value])
+        self.view_buffer = None
+        self.sky_buffer = None
+
+
+def tile_views(layers: numpy.ndarray, columns: int):
+    # Arranges (count, height, width, channels) bottom-up layers in a grid, view 0 at the top left,
+    # the result is bottom-up as well.
+    count, height, width, channels = layers.shape
+    rows = -(-count // columns)
+    grid = numpy.zeros((rows, columns, height, width, channels), dtype=layers.dtype)
+    grid.reshape(rows * columns, height, width, channels)[:count] = layers
+    # The first grid row is at the top, the end of a bottom-up image.
+    return grid[::-1].transpose(0, 2, 1, 3, 4).reshape(rows * height, columns * width, channels)
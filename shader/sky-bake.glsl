@@ -0,0 +1,34 @@
+#version 460
+
+precision highp float;
+precision highp int;
+
+layout(local_size_x = 8, local_size_y = 8, local_size_z = 1) in;
+
+// All six faces are bound as a layered image, the face is gl_GlobalInvocationID.z
+layout(rgba16f, binding = 0) uniform writeonly imageCube image_sky;
+
+#include "sky-model.glsl"
+
+vec3 face_direction(int face, vec2 st) {
+    // Inverse of the cube map face selection in the OpenGL specification.
+    switch (face) {
+        case 0: return vec3(1.0, -st.y, -st.x);
+        case 1: return vec3(-1.0, -st.y, st.x);
+        case 2: return vec3(st.x, 1.0, st.y);
+        case 3: return vec3(st.x, -1.0, -st.y);
+        case 4: return vec3(st.x, -st.y, 1.0);
+        default: return vec3(-st.x, -st.y, -1.0);
+    }
+}
+
+void main() {
+    ivec3 texel = ivec3(gl_GlobalInvocationID);
+    int size = imageSize(image_sky).x;
+    if (texel.x >= size || texel.y >= size) {
+        return;
+    }
+    vec2 st = (vec2(texel.xy) + 0.5) / float(size) * 2.0 - 1.0;
+    vec3 ray_direction = normalize(face_direction(texel.z, st));
+    imageStore(image_sky, texel, vec4(sky_color(ray_direction), 1.0));
+}
@@ -0,0 +1,30 @@
+// The sky seen by the camera, shared by the compute (sky-scene.glsl) and the fragment (sky-fragment.glsl) backends.
+
+layout(std140, binding = 0) uniform Camera {
+    ivec2 screen_size;
+    vec2 view_size;
+    vec3 screen_center;
+    vec3 camera_position;
+    vec3 camera_up;
+    vec3 camera_right;
+};
+
+#ifdef SKY_LUT
+// The sky baked by shader/sky-bake.glsl, the color only depends on the ray direction.
+layout(binding = 0) uniform samplerCube sky_lut;
+#else
+#include "sky-model.glsl"
+#endif
+
+vec3 camera_sky_color(ivec2 pixel) {
+    vec2 half_screen = vec2(screen_size) * 0.5;
+    vec2 relative_xy = (vec2(pixel) - half_screen) / half_screen; // [-1; +1] range coordinates
+    vec2 rectangle_xy = relative_xy * view_size;
+    vec3 rectangle_point = screen_center + rectangle_xy.x * camera_right + rectangle_xy.y * camera_up;
+#ifdef SKY_LUT
+    // Cube map lookups do not need a normalized direction.
+    return texture(sky_lut, rectangle_point - camera_position).rgb;
+#else
+    return sky_color(normalize(rectangle_point - camera_position));
+#endif
+}
@@ -0,0 +1,13 @@
+#version 460
+
+precision highp float;
+precision highp int;
+
+#include "sky-camera.glsl"
+
+layout(location = 0) out vec4 fragment_color;
+
+void main() {
+    // gl_FragCoord is the pixel center, the compute backend shades at the pixel corner.
+    fragment_color = vec4(camera_sky_color(ivec2(gl_FragCoord.xy)), 1.0);
+}
@@ -0,0 +1,7 @@
+#version 460
+
+// A single triangle covering the viewport, the vertices are generated from gl_VertexID without any buffer.
+void main() {
+    vec2 position = vec2((gl_VertexID << 1) & 2, gl_VertexID & 2);
+    gl_Position = vec4(position * 2.0 - 1.0, 0.0, 1.0);
+}
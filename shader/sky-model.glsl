@@ -0,0 +1,30 @@
+#define EPSILON (2.220446049250313e-16)
+
+layout(std140, binding = 1) uniform Sky {
+    vec3 color_sky;
+    vec3 color_sky_horizon;
+    vec3 color_ground_horizon;
+    vec3 color_ground;
+    float size_horizon;
+};
+
+vec3 sky_color(vec3 ray_direction) {
+    float sky_z = ray_direction.z; // 1.0 = sky, -1.0 = ground, 0.0 = horizon
+    float cm = 1.0;
+    if (abs(ray_direction.x) >= EPSILON) {
+        float direction_xy = atan(ray_direction.x, ray_direction.y);
+        cm = 1.0 - abs(direction_xy) / acos(-1.0);
+    }
+    vec3 color;
+    if (sky_z >= size_horizon) {
+        float nuance = (sky_z - size_horizon) / (1.0 - size_horizon);
+        color = nuance * color_sky + (1.0 - nuance) * color_sky_horizon;
+    } else if (sky_z <= -size_horizon) {
+        float nuance = ((-sky_z - size_horizon) / (1.0 - size_horizon));
+        color = nuance * color_ground + (1.0 - nuance) * color_ground_horizon;
+    } else {
+        float nuance = (sky_z + size_horizon) / (2 * size_horizon);
+        color = (nuance) * color_sky_horizon + (1.0 - nuance) * color_ground_horizon;
+    }
+    return cm * color;
+}
@@ -0,0 +1,49 @@
+#version 460
+
+precision highp float;
+precision highp int;
+
+#ifndef LOCAL_SIZE_X
+#define LOCAL_SIZE_X 8
+#endif
+#ifndef LOCAL_SIZE_Y
+#define LOCAL_SIZE_Y 8
+#endif
+#ifndef OUTPUT_FORMAT
+#define OUTPUT_FORMAT rgba8
+#endif
+
+layout(local_size_x = LOCAL_SIZE_X, local_size_y = LOCAL_SIZE_Y, local_size_z = 1) in;
+
+// One layer per view, the view is gl_GlobalInvocationID.z
+layout(OUTPUT_FORMAT, binding = 0) uniform writeonly image2DArray image_views;
+
+// The Camera block of shader/sky-scene.glsl for each view, the screen size is the size of the layers.
+struct View {
+    vec4 screen_center;
+    vec4 camera_position;
+    vec4 camera_up;
+    vec4 camera_right;
+    vec4 view_size;
+};
+
+layout(std430, binding = 0) readonly buffer Views {
+    View views[];
+};
+
+#include "sky-model.glsl"
+
+void main() {
+    ivec3 pixel = ivec3(gl_GlobalInvocationID);
+    ivec2 screen_size = imageSize(image_views).xy;
+    if (any(greaterThanEqual(pixel.xy, screen_size)) || pixel.z >= views.length()) {
+        return;
+    }
+    View view = views[pixel.z];
+    vec2 half_screen = vec2(screen_size) * 0.5;
+    vec2 relative_xy = (vec2(pixel.xy) - half_screen) / half_screen; // [-1; +1] range coordinates
+    vec2 rectangle_xy = relative_xy * view.view_size.xy;
+    vec3 rectangle_point = view.screen_center.xyz + rectangle_xy.x * view.camera_right.xyz + rectangle_xy.y * view.camera_up.xyz;
+    vec3 color = sky_color(normalize(rectangle_point - view.camera_position.xyz));
+    imageStore(image_views, pixel, vec4(color, 1.0));
+}
@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from sys import exit, stderr
+import numpy
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_once(headless_arguments):
+    # Every run is a new process, like a restarted service, so nothing is warm except the OS file cache.
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'startup.json')
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(DIRECTORY, 'headless.py'), '--frames', '1', '--startup', filename, *headless_arguments], cwd=DIRECTORY, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wall = (time.perf_counter() - start) * 1000.0
+        with open(filename) as file:
+            report = json.load(file)
+    # The interpreter startup before the first import, and the teardown after the first frame.
+    report['phases']['process'] = wall - report['total_ms']
+    report['wall_ms'] = wall
+    return report
+
+
+def summarize(reports):
+    names = list(reports[0]['phases'])
+    summary = {}
+    for name in names + ['total_ms', 'wall_ms']:
+        values = numpy.array([report['phases'][name] if name in report['phases'] else report[name] for report in reports])
+        summary[name] = {'median_ms': float(numpy.median(values)), 'min_ms': float(numpy.min(values)), 'max_ms': float(numpy.max(values))}
+    return summary
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the time to first frame of headless.py, by startup phase.')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--json', default=None, help='file to write the summary and every run as JSON')
+    parser.add_argument('headless_arguments', nargs=argparse.REMAINDER, help='arguments passed to headless.py, after --')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    headless_arguments = arguments.headless_arguments
+    if headless_arguments[:1] == ['--']:
+        headless_arguments = headless_arguments[1:]
+    reports = [run_once(headless_arguments) for _ in range(arguments.runs)]
+    summary = summarize(reports)
+    for name, entry in summary.items():
+        print(f'{name:<16} median {entry["median_ms"]:9.2f} ms  min {entry["min_ms"]:9.2f} ms  max {entry["max_ms"]:9.2f} ms', file=stderr)
+    if arguments.json is not None:
+        with open(arguments.json, 'w') as file:
+            json.dump({'arguments': headless_arguments, 'summary': summary, 'runs': reports}, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())